@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+State Benchmark
+Drives each state through enter/handle_event/update/draw on an offscreen
+surface with synthetic input, and reports frame time statistics
+
+Usage: python benchmark.py --frames 600 --output bench.json
+       python benchmark.py --baseline bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+
+# Use SDL's dummy drivers so no window or sound device is needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+# States import their siblings from the data directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+import pygame
+from assets import assets
+from main import Game, FIXED_DT
+
+STATES = ["splash", "title", "character", "game", "options"]
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = int(round(pct / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+def synthetic_events(rng, size):
+    """Build one frame's worth of fake input"""
+    width, height = size
+    events = []
+    # Bursts of mouse motion, like a real mouse produces
+    for _ in range(rng.randint(0, 4)):
+        pos = (rng.randrange(width), rng.randrange(height))
+        events.append(pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0)))
+    roll = rng.random()
+    if roll < 0.05:
+        pos = (rng.randrange(width), rng.randrange(height))
+        events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1))
+        events.append(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1))
+    elif roll < 0.10:
+        char = rng.choice("abcdefghijklmnopqrstuvwxyz")
+        key = pygame.key.key_code(char)
+        events.append(pygame.event.Event(pygame.KEYDOWN, key=key, unicode=char, mod=0))
+    return events
+
+def bench_state(game, name, frames, seed):
+    """Benchmark one state and return its statistics"""
+    state = game.state_manager.get_state(name)
+    surface = pygame.Surface(game.screen.get_size())
+    rng = random.Random(seed)
+
+    assets.preload(name, state.manifest)
+    if not state.data_loaded:
+        state.load_data()
+        state.data_loaded = True
+    state.enter()
+    frame_times = []
+    phase_totals = {'event': 0.0, 'update': 0.0, 'draw': 0.0}
+    draw_calls = blits = 0
+    for _ in range(frames):
+        events = synthetic_events(rng, surface.get_size())
+
+        start = time.perf_counter()
+        for event in events:
+            state.handle_event(event)
+        after_events = time.perf_counter()
+        game.state_manager.keys = pygame.key.get_pressed()
+        game.state_manager.scheduler.update(FIXED_DT, (None, name))
+        state.update(FIXED_DT)
+        after_update = time.perf_counter()
+        counts = game.state_manager.render(state, surface)
+        end = time.perf_counter()
+        draw_calls += counts['draw_calls']
+        blits += counts['blits']
+
+        frame_times.append(end - start)
+        phase_totals['event'] += after_events - start
+        phase_totals['update'] += after_update - after_events
+        phase_totals['draw'] += end - after_update
+
+        # Stay in the state being measured
+        game.state_manager.next_state = None
+        pygame.event.clear()
+    state.exit()
+    assets.release(name)
+    assets.evict_unused()
+
+    total = sum(frame_times)
+    frame_times.sort()
+    return {
+        'frames': frames,
+        'fps': frames / total if total else 0.0,
+        'mean_ms': total / frames * 1000,
+        'p50_ms': percentile(frame_times, 50) * 1000,
+        'p95_ms': percentile(frame_times, 95) * 1000,
+        'p99_ms': percentile(frame_times, 99) * 1000,
+        'max_ms': frame_times[-1] * 1000,
+        'event_ms': phase_totals['event'] / frames * 1000,
+        'update_ms': phase_totals['update'] / frames * 1000,
+        'draw_ms': phase_totals['draw'] / frames * 1000,
+        'draw_calls': draw_calls / frames,
+        'blits': blits / frames
+    }
+
+def compare(results, baseline, threshold):
+    """Print p95 changes against a baseline run; return True on regression"""
+    regressed = False
+    for name, stats in results.items():
+        old = baseline.get('results', {}).get(name)
+        if not old or not old['p95_ms']:
+            continue
+        change = (stats['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"  {name:<10} p95 {old['p95_ms']:.3f}ms -> {stats['p95_ms']:.3f}ms ({change:+.1f}%){flag}")
+        # Not a regression by itself, but usually why a screen got slower
+        if round(stats['draw_calls']) > round(old.get('draw_calls', stats['draw_calls'])):
+            print(f"  {'':<10} draw calls {old['draw_calls']:.0f} -> {stats['draw_calls']:.0f}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark game states")
+    parser.add_argument("--frames", type=int, default=600,
+                        help="frames to run per state")
+    parser.add_argument("--states", default=",".join(STATES),
+                        help="comma-separated states to benchmark")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="seed for the synthetic input")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a previous JSON result")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="p95 slowdown (percent) counted as a regression")
+    args = parser.parse_args()
+
+    game = Game(use_saves=False)
+    results = {}
+    for name in args.states.split(","):
+        stats = bench_state(game, name, args.frames, args.seed)
+        results[name] = stats
+        print(f"{name:<10} {stats['fps']:8.0f} fps  p50 {stats['p50_ms']:.3f}ms  "
+              f"p95 {stats['p95_ms']:.3f}ms  p99 {stats['p99_ms']:.3f}ms  "
+              f"{stats['draw_calls']:.0f} draw calls")
+
+    report = {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'frames': args.frames,
+        'seed': args.seed,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline}:")
+        regressed = compare(results, baseline, args.threshold)
+    sys.exit(1 if regressed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import pygame
+from text_cache import text_cache
+from text_layout import layouts
+
+class AssetManager:
+    """Loads fonts, images and sounds once and hands out shared instances
+
+    Assets are reference counted by owner (usually a state name). When an
+    owner releases its assets, anything no longer owned can be evicted.
+    """
+    def __init__(self):
+        self.assets = {}
+        self.refcounts = {}
+        self.owners = {}
+        self.loads = 0
+        self.hits = 0
+
+    def font(self, name, size, owner=None):
+        """Shared pygame Font for a font file (None for the default) and size"""
+        return self.load("font", name, size, owner=owner)
+
+    def image(self, path, alpha=False, owner=None):
+        """Shared image surface, converted to the display format when possible"""
+        return self.load("image", path, alpha, owner=owner)
+
+    def sound(self, path, owner=None):
+        """Shared decoded Sound"""
+        return self.load("sound", path, owner=owner)
+
+    def load(self, kind, *args, owner=None):
+        """Return the asset for (kind, *args), loading it on first use"""
+        key = (kind,) + args
+        asset = self.assets.get(key)
+        if asset is None:
+            self.ensure_ready(kind)
+            asset = self.store(key, self.decode(kind, *args))
+        else:
+            self.hits += 1
+        self.acquire(key, owner)
+        return asset
+
+    def is_loaded(self, kind, *args):
+        """Whether an asset is already in the cache"""
+        return ((kind,) + args) in self.assets
+
+    def ensure_ready(self, kind):
+        """Main-thread setup needed before an asset of this kind can be decoded"""
+        if kind == "sound" and not pygame.mixer.get_init():
+            pygame.mixer.init()
+
+    def decode(self, kind, *args):
+        """Read and decode an asset; safe to call from a loader thread"""
+        if kind == "font":
+            name, size = args
+            return pygame.font.Font(name, size)
+        if kind == "image":
+            return pygame.image.load(args[0])
+        if kind == "sound":
+            # The mixer must already be initialized on the main thread
+            return pygame.mixer.Sound(args[0])
+        raise ValueError(f"Unknown asset kind: {kind}")
+
+    def store(self, key, asset, owner=None):
+        """Finish a decoded asset on the main thread and add it to the cache"""
+        if key in self.assets:
+            # Loaded some other way while this copy was decoding
+            asset = self.assets[key]
+        else:
+            if key[0] == "image" and pygame.display.get_surface() is not None:
+                asset = asset.convert_alpha() if key[2] else asset.convert()
+            self.assets[key] = asset
+            self.refcounts[key] = 0
+            self.loads += 1
+        self.acquire(key, owner)
+        return asset
+
+    def acquire(self, key, owner):
+        """Count owner as holding a reference to a loaded asset"""
+        if owner is not None:
+            owned = self.owners.setdefault(owner, set())
+            if key not in owned:
+                owned.add(key)
+                self.refcounts[key] += 1
+
+    def preload(self, owner, manifest):
+        """Load every asset in a manifest of (kind, *args) tuples for an owner"""
+        for spec in manifest:
+            self.load(*spec, owner=owner)
+
+    def release(self, owner):
+        """Drop every reference held by an owner"""
+        for key in self.owners.pop(owner, ()):
+            self.refcounts[key] -= 1
+
+    def evict_unused(self):
+        """Forget assets that no owner holds; return how many were evicted"""
+        unused = [key for key, count in self.refcounts.items() if count <= 0]
+        for key in unused:
+            asset = self.assets.pop(key)
+            del self.refcounts[key]
+            if key[0] == "font":
+                # Cached text rendered with this font is no longer useful
+                text_cache.discard_font(asset)
+                layouts.discard_font(asset)
+        return len(unused)
+
+    def stats(self):
+        """Return asset statistics as a dict"""
+        total = self.loads + self.hits
+        return {
+            'size': len(self.assets),
+            'owners': len(self.owners),
+            'loads': self.loads,
+            'hits': self.hits,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+# Shared instance used by every state
+assets = AssetManager()
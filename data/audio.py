@@ -0,0 +1,188 @@
+import pygame
+from collections import OrderedDict
+from assets import assets
+
+# Mixer channels; sounds past this many steal a channel or are dropped
+CHANNEL_COUNT = 16
+# Most copies of one sound playing at once; another restarts the oldest
+MAX_VOICES_PER_SOUND = 4
+# Bytes of decoded sound effects kept, least recently played evicted first
+SFX_CACHE_BYTES = 16 * 1024 * 1024
+# Default fade when music starts or stops
+MUSIC_FADE_MS = 500
+
+class Voice:
+    """What a pool channel is playing"""
+    __slots__ = ("path", "priority", "volume", "started")
+
+    def __init__(self, path, priority, volume, started):
+        self.path = path
+        self.priority = priority
+        self.volume = volume
+        self.started = started
+
+class AudioManager:
+    """Streamed music, cached sound effects and a fixed pool of channels
+
+    Music streams from disk through pygame.mixer.music rather than being
+    decoded whole. Sound effects are decoded once into an LRU bounded by
+    bytes. Each play takes a channel from a fixed pool: a sound already
+    playing MAX_VOICES_PER_SOUND times restarts its oldest voice, and
+    with every channel busy the oldest voice of no higher priority is
+    stolen, or the new sound dropped. Without an audio device every
+    call does nothing.
+    """
+    def __init__(self, cache_bytes=SFX_CACHE_BYTES):
+        self.enabled = False
+        self.channels = []
+        # Channel index -> Voice
+        self.voices = {}
+        # Path -> Sound, least recently played first
+        self.sounds = OrderedDict()
+        self.sound_sizes = {}
+        self.cache_bytes = cache_bytes
+        self.memory = 0
+        self.volumes = {'master_volume': 1.0, 'sfx_volume': 1.0, 'music_volume': 1.0}
+        self.music_path = None
+        self.plays = 0
+        self.hits = 0
+        self.misses = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    def init(self):
+        """Open the mixer and the channel pool; return False without an audio device"""
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+        except pygame.error:
+            self.enabled = False
+            return False
+        pygame.mixer.set_num_channels(CHANNEL_COUNT)
+        self.channels = [pygame.mixer.Channel(index) for index in range(CHANNEL_COUNT)]
+        self.enabled = True
+        return True
+
+    def set_volumes(self, settings):
+        """Take the volume settings and apply them to everything playing"""
+        for key in self.volumes:
+            if key in settings:
+                self.volumes[key] = settings[key]
+        if not self.enabled:
+            return
+        pygame.mixer.music.set_volume(self.music_volume)
+        for index, voice in self.voices.items():
+            self.channels[index].set_volume(voice.volume * self.sfx_volume)
+
+    @property
+    def music_volume(self):
+        return self.volumes['master_volume'] * self.volumes['music_volume']
+
+    @property
+    def sfx_volume(self):
+        return self.volumes['master_volume'] * self.volumes['sfx_volume']
+
+    def play_music(self, path, loops=-1, fade_ms=MUSIC_FADE_MS):
+        """Stream a music file, unless it is already playing"""
+        if not self.enabled or (path == self.music_path and pygame.mixer.music.get_busy()):
+            return
+        pygame.mixer.music.load(path)
+        pygame.mixer.music.set_volume(self.music_volume)
+        pygame.mixer.music.play(loops, fade_ms=fade_ms)
+        self.music_path = path
+
+    def stop_music(self, fade_ms=MUSIC_FADE_MS):
+        if self.enabled and self.music_path:
+            pygame.mixer.music.fadeout(fade_ms)
+        self.music_path = None
+
+    def sound(self, path):
+        """Decoded Sound for a file, from the cache when possible"""
+        sound = self.sounds.get(path)
+        if sound is not None:
+            self.hits += 1
+            self.sounds.move_to_end(path)
+            return sound
+        self.misses += 1
+        assets.ensure_ready("sound")
+        return self.store(path, assets.decode("sound", path))
+
+    def store(self, path, sound):
+        """Add a decoded Sound to the cache, evicting the least recently played"""
+        if path in self.sounds:
+            return self.sounds[path]
+        frequency, size, channels = pygame.mixer.get_init()
+        self.sound_sizes[path] = int(sound.get_length() * frequency) * channels * abs(size) // 8
+        self.sounds[path] = sound
+        self.memory += self.sound_sizes[path]
+        # Channels hold on to sounds they are playing, so eviction never cuts one off
+        while self.memory > self.cache_bytes and len(self.sounds) > 1:
+            old_path, _ = self.sounds.popitem(last=False)
+            self.memory -= self.sound_sizes.pop(old_path)
+        return sound
+
+    def preload(self, loader, paths):
+        """Decode sounds on a Loader's worker threads, so first plays don't stall"""
+        if not self.enabled:
+            return
+        assets.ensure_ready("sound")
+        for path in paths:
+            if path not in self.sounds:
+                loader.submit(assets.decode, "sound", path,
+                              callback=lambda sound, path=path: self.store(path, sound))
+
+    def pick_channel(self, path, priority):
+        """Index of the channel a new sound should use, or None to drop it"""
+        for index in [index for index in self.voices if not self.channels[index].get_busy()]:
+            del self.voices[index]
+
+        same = [index for index, voice in self.voices.items() if voice.path == path]
+        if len(same) >= MAX_VOICES_PER_SOUND:
+            return min(same, key=lambda index: self.voices[index].started)
+        for index in range(len(self.channels)):
+            if index not in self.voices:
+                return index
+        candidates = [index for index, voice in self.voices.items() if voice.priority <= priority]
+        if not candidates:
+            return None
+        self.stolen += 1
+        return min(candidates, key=lambda index: (self.voices[index].priority, self.voices[index].started))
+
+    def play(self, path, priority=0, volume=1.0):
+        """Play a sound effect; return its Channel, or None if it was dropped"""
+        if not self.enabled:
+            return None
+        sound = self.sound(path)
+        index = self.pick_channel(path, priority)
+        if index is None:
+            self.dropped += 1
+            return None
+        self.plays += 1
+        channel = self.channels[index]
+        channel.play(sound)
+        channel.set_volume(volume * self.sfx_volume)
+        self.voices[index] = Voice(path, priority, volume, self.plays)
+        return channel
+
+    def stop_all(self):
+        if self.enabled:
+            pygame.mixer.stop()
+        self.voices.clear()
+
+    def stats(self):
+        """Return sound cache and channel statistics as a dict"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self.sounds),
+            'memory': self.memory,
+            'voices': len(self.voices),
+            'plays': self.plays,
+            'stolen': self.stolen,
+            'dropped': self.dropped,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+# Shared instance used by every state
+audio = AudioManager()
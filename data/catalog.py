@@ -0,0 +1,182 @@
+import os
+import json
+import marshal
+import struct
+import tempfile
+import zlib
+
+# Content files ship in the data package; their compiled copies are cached
+# next to the game, outside it
+CONTENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "content")
+
+MAGIC = b"TMCT"
+FORMAT_VERSION = 1
+# magic, format version, marshal version, source mtime (ns), source size, source CRC
+HEADER = struct.Struct("<4sHHqQI")
+
+class ContentError(Exception):
+    """A content file is malformed"""
+
+def freeze(value):
+    """Turn lists into tuples, so colors and tag lists are immutable"""
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return {key: freeze(item) for key, item in value.items()}
+    return value
+
+def compile_table(name, source):
+    """Parse a content file into its entries and a tag -> positions index"""
+    try:
+        items = json.loads(source)
+    except ValueError as error:
+        raise ContentError(f"{name}: {error}") from error
+    if not isinstance(items, list):
+        raise ContentError(f"{name}: expected a list of entries")
+
+    entries = []
+    tag_index = {}
+    ids = set()
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or "id" not in item:
+            raise ContentError(f"{name}: entry {position} has no id")
+        if item["id"] in ids:
+            raise ContentError(f"{name}: duplicate id {item['id']!r}")
+        ids.add(item["id"])
+        entry = freeze(item)
+        entry.setdefault("tags", ())
+        for tag in entry["tags"]:
+            tag_index.setdefault(tag, []).append(position)
+        entries.append(entry)
+    return entries, {tag: tuple(positions) for tag, positions in tag_index.items()}
+
+class Table:
+    """The entries of one content file, looked up by id or tag"""
+    def __init__(self, name, entries, tag_index):
+        self.name = name
+        self.entries = entries
+        self.tag_index = tag_index
+        self.by_id = {entry["id"]: entry for entry in entries}
+
+    def get(self, entry_id, default=None):
+        return self.by_id.get(entry_id, default)
+
+    def __getitem__(self, entry_id):
+        return self.by_id[entry_id]
+
+    def __contains__(self, entry_id):
+        return entry_id in self.by_id
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def tagged(self, tag):
+        """Entries with a tag, in file order"""
+        return [self.entries[position] for position in self.tag_index.get(tag, ())]
+
+class Catalog:
+    """Game content loaded from JSON files, one table per file
+
+    Tables are loaded the first time they are asked for. Parsed tables
+    are kept in a marshal cache, used while the source file's mtime and
+    size are unchanged; if they differ, the source is checksummed and
+    only parsed again when its contents really changed.
+    """
+    def __init__(self, content_dir=CONTENT_DIR, cache_dir=CACHE_DIR):
+        self.content_dir = content_dir
+        self.cache_dir = cache_dir
+        self.tables = {}
+        self.cache_loads = 0
+        self.compiles = 0
+
+    def table(self, name):
+        table = self.tables.get(name)
+        if table is None:
+            table = self.tables[name] = Table(name, *self.load(name))
+        return table
+
+    __getitem__ = table
+
+    def source_path(self, name):
+        return os.path.join(self.content_dir, name + ".json")
+
+    def cache_path(self, name):
+        return os.path.join(self.cache_dir, name + ".bin")
+
+    def load(self, name):
+        """Return a table's (entries, tag index), from the cache if it is current"""
+        source_path = self.source_path(name)
+        stat = os.stat(source_path)
+        cached = self.read_cache(name)
+        if cached:
+            mtime, size, crc, compiled = cached
+            if mtime == stat.st_mtime_ns and size == stat.st_size:
+                self.cache_loads += 1
+                return compiled
+
+        with open(source_path, "rb") as f:
+            source = f.read()
+        source_crc = zlib.crc32(source)
+        if cached and size == len(source) and crc == source_crc:
+            # Touched but unchanged; restamp the cache so the next start skips the checksum
+            self.cache_loads += 1
+        else:
+            compiled = compile_table(name, source)
+            self.compiles += 1
+        self.write_cache(name, stat, source_crc, compiled)
+        return compiled
+
+    def read_cache(self, name):
+        """Return (mtime, size, crc, compiled) from a table's cache, or None if unusable"""
+        try:
+            with open(self.cache_path(name), "rb") as f:
+                data = f.read()
+            magic, version, marshal_version, mtime, size, crc = HEADER.unpack_from(data)
+            if magic != MAGIC or version != FORMAT_VERSION or marshal_version != marshal.version:
+                return None
+            return mtime, size, crc, marshal.loads(data[HEADER.size:])
+        except (OSError, struct.error, EOFError, ValueError, TypeError):
+            return None
+
+    def write_cache(self, name, stat, crc, compiled):
+        temp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # A temporary file of its own, so loader threads compiling the
+            # same table can't interleave their writes
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir, prefix=name + ".", suffix=".tmp",
+                                             delete=False) as f:
+                temp_path = f.name
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version,
+                                    stat.st_mtime_ns, stat.st_size, crc))
+                f.write(marshal.dumps(compiled))
+            os.replace(temp_path, self.cache_path(name))
+        except OSError:
+            # A read-only install still works, it just parses at every start
+            if temp_path:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        """Forget loaded tables; they are reloaded on next access"""
+        self.tables.clear()
+
+    def stats(self):
+        """Return catalog statistics as a dict; hits are tables read from the cache"""
+        total = self.cache_loads + self.compiles
+        return {
+            'size': len(self.tables),
+            'entries': sum(len(table) for table in self.tables.values()),
+            'cache_loads': self.cache_loads,
+            'compiles': self.compiles,
+            'hit_rate': self.cache_loads / total if total else 0.0
+        }
+
+# Shared instance used by every state
+catalog = Catalog()
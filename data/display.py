@@ -0,0 +1,116 @@
+import warnings
+import pygame
+
+# Size of the surface states draw to; all layout is in these coordinates
+LOGICAL_SIZE = (800, 600)
+
+# Graphics presets. render_scale is the fraction of the logical resolution
+# the game world is rendered at before being scaled up under the HUD;
+# smooth picks filtered scaling when the logical surface is scaled in
+# software rather than by SDL
+PRESETS = {
+    "quality": {'render_scale': 1.0, 'smooth': True},
+    "performance": {'render_scale': 0.5, 'smooth': False}
+}
+DEFAULT_PRESET = "quality"
+
+MOUSE_EVENTS = (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP)
+
+class Display:
+    """The window, and the logical surface states draw to
+
+    The fast path opens the window with SDL's SCALED flag: the display
+    surface is then the logical surface itself, and SDL scales it to the
+    window or the whole desktop as it is presented. Where SDL can't
+    create the renderer that needs, fullscreen opens the window at the
+    desktop resolution instead, and present() scales the logical surface
+    into it once per frame, letterboxed.
+    """
+    def __init__(self, caption):
+        self.caption = caption
+        self.window = None
+        self.surface = None
+        # Area of the window the logical surface is scaled into
+        self.viewport = pygame.Rect((0, 0), LOGICAL_SIZE)
+        self.fullscreen = False
+        self.preset = DEFAULT_PRESET
+        # Whether SDL is scaling the logical surface, and whether on the GPU
+        self.scaled = False
+        self.accelerated = False
+
+    @property
+    def render_scale(self):
+        return PRESETS[self.preset]['render_scale']
+
+    def apply(self, fullscreen=False, preset=DEFAULT_PRESET):
+        """Open or reconfigure the window; return True if anything changed"""
+        if preset not in PRESETS:
+            preset = DEFAULT_PRESET
+        changed = preset != self.preset
+        self.preset = preset
+        if self.window is not None and fullscreen == self.fullscreen:
+            return changed
+
+        self.fullscreen = fullscreen
+        flags = pygame.FULLSCREEN if fullscreen else 0
+        # pygame warns when SCALED has to use SDL's software renderer
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            try:
+                self.window = pygame.display.set_mode(LOGICAL_SIZE, flags | pygame.SCALED)
+                self.scaled = True
+            except pygame.error:
+                self.window = pygame.display.set_mode((0, 0) if fullscreen else LOGICAL_SIZE, flags)
+                self.scaled = False
+        self.accelerated = self.scaled and not caught
+        pygame.display.set_caption(self.caption)
+
+        if self.window.get_size() == LOGICAL_SIZE:
+            self.surface = self.window
+            self.viewport = self.window.get_rect()
+        else:
+            self.surface = pygame.Surface(LOGICAL_SIZE).convert()
+            # Largest area with the logical aspect ratio, centred
+            window_rect = self.window.get_rect()
+            factor = min(window_rect.width / LOGICAL_SIZE[0], window_rect.height / LOGICAL_SIZE[1])
+            self.viewport = pygame.Rect(0, 0, int(LOGICAL_SIZE[0] * factor), int(LOGICAL_SIZE[1] * factor))
+            self.viewport.center = window_rect.center
+            self.window.fill((0, 0, 0))
+        return True
+
+    def present(self, rects=None):
+        """Show the logical surface; rects limits it to changed regions where possible"""
+        if self.surface is self.window:
+            if rects is None:
+                pygame.display.flip()
+            elif rects:
+                pygame.display.update(rects)
+            return
+        scale = pygame.transform.smoothscale if PRESETS[self.preset]['smooth'] else pygame.transform.scale
+        scale(self.surface, self.viewport.size, self.window.subsurface(self.viewport))
+        pygame.display.update(self.viewport)
+
+    def map_event(self, event):
+        """Translate a mouse event from window to logical coordinates"""
+        if self.surface is self.window or event.type not in MOUSE_EVENTS:
+            return event
+        x = (event.pos[0] - self.viewport.x) * LOGICAL_SIZE[0] // self.viewport.width
+        y = (event.pos[1] - self.viewport.y) * LOGICAL_SIZE[1] // self.viewport.height
+        attributes = dict(event.dict, pos=(min(max(x, 0), LOGICAL_SIZE[0] - 1),
+                                           min(max(y, 0), LOGICAL_SIZE[1] - 1)))
+        if event.type == pygame.MOUSEMOTION:
+            attributes['rel'] = (event.rel[0] * LOGICAL_SIZE[0] // self.viewport.width,
+                                 event.rel[1] * LOGICAL_SIZE[1] // self.viewport.height)
+        return pygame.event.Event(event.type, attributes)
+
+    def stats(self):
+        """Return display settings as a dict"""
+        return {
+            'logical_size': LOGICAL_SIZE,
+            'window_size': self.window.get_size() if self.window else None,
+            'fullscreen': self.fullscreen,
+            'scaled': self.scaled,
+            'accelerated': self.accelerated,
+            'preset': self.preset,
+            'render_scale': self.render_scale
+        }
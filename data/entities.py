@@ -0,0 +1,193 @@
+import numpy as np
+
+# Entity behaviour states
+IDLE = 0     # moves only by its own velocity (e.g. the player)
+WANDER = 1   # drifts in a randomly changing direction
+SEEK = 2     # steers towards its target
+
+class EntityStore:
+    """Positions, velocities, sizes and states of every entity in NumPy arrays
+
+    Each entity is one row. Updates run over all rows at once, so their
+    cost grows with the array size rather than per-object Python work.
+    """
+    def __init__(self, bounds, capacity=256, seed=0):
+        self.bounds = np.array(bounds, dtype=np.float64)
+        self.count = 0  # rows in use, including despawned ones
+        self.free = []
+        self.rng = np.random.default_rng(seed)
+        self.wander_jitter = 300.0  # pixels per second squared
+        self.steer_rate = 4.0  # fraction of the velocity error fixed per second
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        """Create (or grow) the arrays, keeping existing rows"""
+        old = self.count
+        arrays = {
+            'positions': np.zeros((capacity, 2)),
+            'prev_positions': np.zeros((capacity, 2)),
+            'velocities': np.zeros((capacity, 2)),
+            'targets': np.zeros((capacity, 2)),
+            'min_positions': np.zeros((capacity, 2)),
+            'max_positions': np.zeros((capacity, 2)),
+            'speeds': np.zeros(capacity),
+            'sizes': np.zeros(capacity, dtype=np.int32),
+            'states': np.zeros(capacity, dtype=np.int8),
+            'colors': np.zeros((capacity, 3), dtype=np.uint8),
+            'kinds': np.zeros(capacity, dtype=np.int16),
+            'alive': np.zeros(capacity, dtype=bool)
+        }
+        for name, array in arrays.items():
+            if old:
+                array[:old] = getattr(self, name)[:old]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def spawn(self, x, y, size, speed, state=IDLE, color=(255, 255, 255), kind=0, handle_class=None):
+        """Add an entity and return a handle to its row"""
+        if self.free:
+            index = self.free.pop()
+        else:
+            if self.count == self.capacity:
+                self.allocate(self.capacity * 2)
+            index = self.count
+            self.count += 1
+
+        self.positions[index] = (x, y)
+        self.prev_positions[index] = (x, y)
+        self.velocities[index] = 0
+        self.targets[index] = (x, y)
+        self.speeds[index] = speed
+        self.sizes[index] = size
+        # Precomputed clamp limits, so update() needn't derive them each tick
+        self.min_positions[index] = size // 2
+        self.max_positions[index] = self.bounds - size // 2
+        self.states[index] = state
+        self.colors[index] = color
+        self.kinds[index] = kind
+        self.alive[index] = True
+        if state == WANDER:
+            angle = self.rng.uniform(0, 2 * np.pi)
+            self.velocities[index] = (np.cos(angle) * speed, np.sin(angle) * speed)
+        return (handle_class or EntityHandle)(self, index)
+
+    def despawn(self, handle):
+        """Remove an entity; its row is reused by a later spawn"""
+        # A dead row has no velocity and no behaviour, so update() can run
+        # over every row without masking it out
+        self.alive[handle.index] = False
+        self.velocities[handle.index] = 0
+        self.states[handle.index] = IDLE
+        self.free.append(handle.index)
+
+    def live_indices(self):
+        """Row numbers of every live entity"""
+        return np.flatnonzero(self.alive[:self.count])
+
+    def update(self, dt):
+        """Steer, move and clamp every live entity"""
+        n = self.count
+        if not n:
+            return
+        states = self.states[:n]
+        positions = self.positions[:n]
+        velocities = self.velocities[:n]
+
+        self.prev_positions[:n] = positions
+
+        # Wandering: jitter the heading, keep the speed
+        wander = np.flatnonzero(states == WANDER)
+        if len(wander):
+            v = velocities[wander]
+            v += self.rng.normal(0.0, self.wander_jitter * dt, v.shape)
+            norms = np.hypot(v[:, 0], v[:, 1])
+            norms[norms == 0] = 1.0
+            v *= (self.speeds[wander] / norms)[:, None]
+            velocities[wander] = v
+
+        # Seeking: ease the velocity towards the target direction
+        seek = np.flatnonzero(states == SEEK)
+        if len(seek):
+            offset = self.targets[seek] - positions[seek]
+            dist = np.hypot(offset[:, 0], offset[:, 1])
+            dist[dist == 0] = 1.0
+            desired = offset * (self.speeds[seek] / dist)[:, None]
+            blend = min(1.0, self.steer_rate * dt)
+            velocities[seek] += (desired - velocities[seek]) * blend
+
+        # Move; dead rows have no velocity
+        positions += velocities * dt
+
+        # Keep entities inside the bounds, bouncing off the edges
+        low = self.min_positions[:n]
+        high = self.max_positions[:n]
+        hit = (positions < low) | (positions > high)
+        np.negative(velocities, out=velocities, where=hit)
+        np.clip(positions, low, high, out=positions)
+
+    def interpolated_positions(self, indices, alpha):
+        """Positions of rows between their last two updates"""
+        prev = self.prev_positions[indices]
+        return prev + (self.positions[indices] - prev) * alpha
+
+class EntityHandle:
+    """Lightweight view of one entity row"""
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def x(self):
+        return float(self.store.positions[self.index, 0])
+
+    @x.setter
+    def x(self, value):
+        self.store.positions[self.index, 0] = value
+
+    @property
+    def y(self):
+        return float(self.store.positions[self.index, 1])
+
+    @y.setter
+    def y(self, value):
+        self.store.positions[self.index, 1] = value
+
+    @property
+    def prev_x(self):
+        return float(self.store.prev_positions[self.index, 0])
+
+    @property
+    def prev_y(self):
+        return float(self.store.prev_positions[self.index, 1])
+
+    @property
+    def size(self):
+        return int(self.store.sizes[self.index])
+
+    @property
+    def speed(self):
+        return float(self.store.speeds[self.index])
+
+    @speed.setter
+    def speed(self, value):
+        self.store.speeds[self.index] = value
+
+    @property
+    def kind(self):
+        return int(self.store.kinds[self.index])
+
+    @property
+    def state(self):
+        return int(self.store.states[self.index])
+
+    @state.setter
+    def state(self, value):
+        self.store.states[self.index] = value
+
+    def set_velocity(self, vx, vy):
+        self.store.velocities[self.index] = (vx, vy)
+
+    def set_target(self, x, y):
+        self.store.targets[self.index] = (x, y)
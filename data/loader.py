@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+from assets import assets
+
+class Loader:
+    """Runs file I/O and decoding on a worker thread pool
+
+    Jobs run on the workers; their callbacks run on the main thread
+    from poll(), so only the main thread touches shared game objects.
+    """
+    def __init__(self, workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="loader")
+        self.pending = []
+        self.total = 0
+        self.completed = 0
+
+    def submit(self, func, *args, callback=None):
+        """Run func(*args) on a worker; callback(result) runs in poll()"""
+        future = self.executor.submit(func, *args)
+        self.pending.append((future, callback))
+        self.total += 1
+        return future
+
+    def load_manifest(self, owner, manifest):
+        """Decode every asset in a manifest that isn't loaded yet"""
+        for kind, *args in manifest:
+            key = (kind,) + tuple(args)
+            if assets.is_loaded(*key):
+                assets.acquire(key, owner)
+                continue
+            assets.ensure_ready(kind)
+            self.submit(assets.decode, *key,
+                        callback=lambda asset, key=key: assets.store(key, asset, owner))
+
+    def poll(self):
+        """Finish completed jobs on the main thread; return progress (0-1)"""
+        still_pending = []
+        for future, callback in self.pending:
+            if not future.done():
+                still_pending.append((future, callback))
+                continue
+            # Re-raises any error from the worker
+            result = future.result()
+            if callback:
+                callback(result)
+            self.completed += 1
+        self.pending = still_pending
+        return self.progress
+
+    @property
+    def progress(self):
+        return self.completed / self.total if self.total else 1.0
+
+    def is_done(self):
+        return not self.pending
+
+    def shutdown(self):
+        """Stop the workers, dropping jobs that haven't started"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pending = []
@@ -1,56 +1,294 @@
+import time
+# Measure startup from before the heavier imports
+STARTUP_START = time.perf_counter()
+
 import pygame
 import sys
-from data.state_manager import StateManager
-from states.splash import SplashState
-from states.title import TitleState
-from states.character import CharacterState
-from states.game_state import GameState
-from states.options import OptionsState
+from state_manager import StateManager
+from profiler import FrameProfiler, ProfilerOverlay
+from save import saves
+from recording import InputRecorder
+from ui import coalesce_motion
+from display import Display, DEFAULT_PRESET
+from audio import audio
+
+# Simulation runs in fixed steps so results don't depend on frame rate
+FIXED_DT = 1.0 / 60
+# Longest frame fed to the simulation, so a stall can't snowball
+MAX_FRAME_TIME = 0.25
+# Longest an idle state sleeps waiting for events; also caps the time its
+# timers advance by when it wakes
+IDLE_TIMEOUT = 1.0
+# Frame rate while the window is unfocused or minimized
+BACKGROUND_FRAME_RATE = 5
+# Toggles the profiler overlay
+PROFILER_KEY = pygame.K_F3
+# Seconds from launch to the first presented frame before startup is "slow"
+STARTUP_BUDGET = 1.0
+
+# States are imported and created on first use
+STATES = {
+    "splash": "states.splash:SplashState",
+    "title": "states.title:TitleState",
+    "character": "states.character:CharacterState",
+    "game": "states.game_state:GameState",
+    "options": "states.options:OptionsState",
+    "pause": "states.pause:PauseState"
+}
 
 class Game:
-    def __init__(self):
+    def __init__(self, dirty_rects=False, profile_csv=None, startup_report=False,
+                 record=None, use_saves=True):
+        # (label, seconds since launch) checkpoints for the startup report
+        self.startup_marks = []
+        self.startup_report = startup_report
+        self.mark_startup("imports")
+        
         pygame.init()
-        self.screen = pygame.display.set_mode((800, 600))
-        pygame.display.set_caption("Your Game")
+        self.mark_startup("pygame.init")
+        
+        # Saved settings and progress; values are decoded when states ask for them.
+        # Without use_saves they are kept in memory only
+        if use_saves:
+            saves.open()
+            self.mark_startup("saves")
+            
+        # Window opened with the saved display settings
+        settings = saves.get("settings", {})
+        self.display = Display("Your Game")
+        self.display.apply(settings.get('fullscreen', False), settings.get('preset', DEFAULT_PRESET))
+        self.mark_startup("display")
+        
+        # Sound effect channels and music, at the saved volumes
+        audio.init()
+        audio.set_volumes(settings)
+        self.mark_startup("audio")
         self.clock = pygame.time.Clock()
         self.running = True
+        # Window state, from WINDOW* events; drawing stops while minimized
+        self.focused = True
+        self.minimized = False
+        
+        # Dirty-rect mode: only redraw and present regions states report
+        self.dirty_rects = dirty_rects
+        
+        # Frame profiler, dumped to profile_csv on exit if given
+        self.profiler = FrameProfiler()
+        self.profiler_overlay = ProfilerOverlay(self.profiler)
+        self.profile_csv = profile_csv
         
         # Initialize state manager
         self.state_manager = StateManager()
+        self.state_manager.profiler = self.profiler
+        self.state_manager.display = self.display
+        
+        # Input recording for replay, written to record on exit
+        self.recorder = None
+        if record:
+            self.recorder = InputRecorder(record)
+            self.state_manager.input = self.recorder
         
-        # Create and add states
-        self.state_manager.add_state("splash", SplashState())
-        self.state_manager.add_state("title", TitleState())
-        self.state_manager.add_state("character", CharacterState())
-        self.state_manager.add_state("game", GameState())
-        self.state_manager.add_state("options", OptionsState())
+        # Register states
+        for name, path in STATES.items():
+            self.state_manager.add_state(name, path)
         
         # Start with splash screen
         self.state_manager.change_state("splash")
+        self.mark_startup("game init")
+        
+    @property
+    def screen(self):
+        """Logical surface states draw to; replaced when the display mode changes"""
+        return self.display.surface
+        
+    def mark_startup(self, label):
+        """Record a startup checkpoint"""
+        self.startup_marks.append((label, time.perf_counter() - STARTUP_START))
+        
+    def report_startup(self):
+        """Print how long each startup step took"""
+        previous = 0.0
+        print("Startup:")
+        for label, elapsed in self.startup_marks:
+            print(f"  {label:<16} {(elapsed - previous) * 1000:8.1f}ms")
+            previous = elapsed
+        for name, seconds in self.state_manager.creation_times.items():
+            print(f"  created {name:<8} {seconds * 1000:8.1f}ms")
+        total = self.startup_marks[-1][1]
+        status = "over budget" if total > STARTUP_BUDGET else "ok"
+        print(f"  total            {total * 1000:8.1f}ms ({status}, budget {STARTUP_BUDGET * 1000:.0f}ms)")
+        
+    def frame_policy(self):
+        """Frame rate cap for the next frame, and how long to sleep first
+        
+        Returns (frame rate, idle wait). The wait is None while the current
+        state is animating or has changes to draw, or the profiler overlay
+        is shown, or in recorded sessions; otherwise it is the time until the
+        state's next timer, at most IDLE_TIMEOUT.
+        """
+        state_manager = self.state_manager
+        state = state_manager.states.get(state_manager.current_state)
+        frame_rate = state.frame_rate if state else 60
+        if not self.focused or self.minimized:
+            frame_rate = min(frame_rate, BACKGROUND_FRAME_RATE)
+        # The profiler overlay is redrawn every frame, and recorded sessions run
+        # every step so a replay's timers fire on the same ticks
+        if (state is None or state.animating or state_manager.next_state or state.needs_redraw()
+                or self.profiler_overlay.visible or state_manager.input):
+            return frame_rate, None
+        next_due = state_manager.scheduler.next_due((None, state_manager.current_state))
+        wait = IDLE_TIMEOUT if next_due is None else min(next_due, IDLE_TIMEOUT)
+        return frame_rate, wait
         
     def run(self):
         """Main game loop"""
+        accumulator = 0.0
+        first_frame = True
         while self.running:
+            frame_rate, wait = self.frame_policy()
+            
+            # Nothing changes until an event or a timer, so sleep rather than spin
+            waited = []
+            idle = 0.0
+            if wait is not None:
+                start = time.perf_counter()
+                event = pygame.event.wait(max(1, int(wait * 1000)))
+                idle = time.perf_counter() - start
+                if event.type != pygame.NOEVENT:
+                    waited.append(event)
+                    
             # Calculate delta time (in seconds)
-            dt = self.clock.tick(60) / 1000.0
+            dt = self.clock.tick(frame_rate) / 1000.0
+            if wait is None:
+                accumulator += min(dt, MAX_FRAME_TIME)
+            else:
+                # The time asleep goes to the state's timers, then one step
+                # runs, rather than a burst of steps to catch up
+                self.state_manager.idle(max(0.0, min(dt, IDLE_TIMEOUT) - FIXED_DT))
+                accumulator = FIXED_DT
+            self.profiler.begin_frame()
             
             # Handle events
-            for event in pygame.event.get():
+            start = time.perf_counter()
+            # A burst of mouse motion is handled as one move; positions are
+            # given in logical coordinates
+            events = [self.display.map_event(event) for event in coalesce_motion(waited + pygame.event.get())]
+            self.profiler.add("pump", time.perf_counter() - start)
+            for event in events:
                 if event.type == pygame.QUIT:
                     self.running = False
+                elif event.type in (pygame.WINDOWFOCUSLOST, pygame.WINDOWFOCUSGAINED):
+                    self.focused = event.type == pygame.WINDOWFOCUSGAINED
+                elif event.type in (pygame.WINDOWMINIMIZED, pygame.WINDOWRESTORED):
+                    self.minimized = event.type == pygame.WINDOWMINIMIZED
+                    self.state_manager.mark_dirty()
+                elif event.type == pygame.KEYDOWN and event.key == PROFILER_KEY:
+                    self.profiler_overlay.toggle()
+                    self.state_manager.mark_dirty(self.profiler_overlay.rect)
                 else:
+                    if self.recorder:
+                        self.recorder.record_event(event)
                     self.state_manager.handle_event(event)
             
-            # Update
-            self.state_manager.update(dt)
+            # Update in fixed steps
+            while accumulator >= FIXED_DT:
+                self.state_manager.update(FIXED_DT)
+                accumulator -= FIXED_DT
+                
+            # Fraction of a step left over, for interpolating between states
+            self.state_manager.interpolation = accumulator / FIXED_DT
             
-            # Draw
-            self.screen.fill((0, 0, 0))  # Clear screen
-            self.state_manager.draw(self.screen)
-            pygame.display.flip()
+            # Draw, unless nothing changed or the window can't be seen
+            current = self.state_manager.states.get(self.state_manager.current_state)
+            changed = (current is None or current.animating or current.needs_redraw()
+                       or self.profiler_overlay.visible)
+            if changed and not self.minimized:
+                self.draw_frame()
+            # Time spent asleep waiting for events isn't part of the frame
+            self.profiler.end_frame(self.state_manager.current_state, max(0.0, dt - idle))
+            
+            if first_frame:
+                first_frame = False
+                self.mark_startup("first frame")
+                if self.startup_report:
+                    self.report_startup()
             
+        if self.profile_csv:
+            self.profiler.write_csv(self.profile_csv)
+        if self.recorder:
+            self.recorder.save(self.state_manager)
+        # Leaving the current (and any suspended) state may save progress
+        self.state_manager.exit_all()
+        saves.close()
         pygame.quit()
         sys.exit()
+        
+    def draw_frame(self):
+        """Draw the current state and the profiler overlay, and present them"""
+        overlay = self.profiler_overlay
+        if self.dirty_rects:
+            if overlay.visible:
+                # The overlay changes every frame
+                self.state_manager.mark_dirty(overlay.rect)
+            rects = self.state_manager.draw(self.screen, dirty_only=True)
+            if overlay.visible:
+                overlay.draw(self.screen, self.state_manager.current_state)
+            start = time.perf_counter()
+            self.display.present(rects)
+        else:
+            self.screen.fill((0, 0, 0))  # Clear screen
+            self.state_manager.draw(self.screen)
+            if overlay.visible:
+                overlay.draw(self.screen, self.state_manager.current_state)
+            start = time.perf_counter()
+            self.display.present()
+        self.profiler.add("flip", time.perf_counter() - start)
+        
+    def simulate(self, ticks, state_name="game"):
+        """Run fixed simulation steps of a state as fast as possible, without drawing"""
+        self.state_manager.change_state(state_name)
+        for _ in range(ticks):
+            self.state_manager.update(FIXED_DT)
+        return self.state_manager.get_state(state_name)
+        
+    def replay(self, player, speed=None, draw=True):
+        """Play back a ReplayPlayer's recording; return the seconds it took
+        
+        With speed None ticks run back to back, one per frame, as fast as
+        possible; otherwise they run at speed times real time. Frames are
+        drawn (unless draw is False) and timed by the profiler as usual.
+        """
+        player.start(self.state_manager)
+        start = time.perf_counter()
+        while not player.done:
+            self.profiler.begin_frame()
+            frame_start = time.perf_counter()
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                break
+            if speed:
+                # Every tick due by now
+                due = int((frame_start - start) * speed / FIXED_DT) + 1
+            else:
+                due = player.position + 1
+            while not player.done and player.position < due:
+                player.feed_events(self.state_manager)
+                self.state_manager.update(FIXED_DT)
+                
+            if draw:
+                self.screen.fill((0, 0, 0))
+                self.state_manager.draw(self.screen)
+                flip_start = time.perf_counter()
+                self.display.present()
+                self.profiler.add("flip", time.perf_counter() - flip_start)
+            self.profiler.end_frame(self.state_manager.current_state, time.perf_counter() - frame_start)
+            
+            if speed:
+                # Wait for the next tick to fall due
+                next_due = start + player.position * FIXED_DT / speed
+                time.sleep(max(0.0, next_due - time.perf_counter()))
+        elapsed = time.perf_counter() - start
+        player.finish(self.state_manager)
+        return elapsed
 
 if __name__ == "__main__":
     game = Game()
@@ -0,0 +1,244 @@
+import numpy as np
+import pygame
+
+# Most particles alive at once; emission past this is dropped
+PARTICLE_CAPACITY = 32768
+# Alpha steps each emitter's sprite is pre-rendered at
+ALPHA_LEVELS = 16
+# Particles are emitted and kept this far outside the view, so ones
+# drifting or scrolled into view are already there
+VIEW_MARGIN = 64
+# Longest step particles advance at once, e.g. after the game was suspended
+MAX_STEP = 0.1
+# View area the emitter rates are given for
+RATE_AREA = 800 * 600
+
+# Envelope of a particle's alpha over its life
+FADES = {"none": 0, "out": 1, "inout": 2}
+
+class Emitter:
+    """One kind of particle, configured by an "emitters" content entry
+
+    rate is particles per second over RATE_AREA of view; lifetime and
+    each velocity axis are (min, max) ranges. "point" particles are a
+    single pixel added to the screen; other shapes ("ring", "dot",
+    "glow") are pre-rendered sprites, blended additively if blend is
+    "add".
+    """
+    def __init__(self, entry):
+        self.id = entry["id"]
+        self.shape = entry.get("shape", "dot")
+        self.size = entry.get("size", 4)
+        self.color = entry.get("color", (255, 255, 255))
+        self.alpha = entry.get("alpha", 1.0)
+        self.fade = FADES[entry.get("fade", "out")]
+        self.blend = entry.get("blend", "alpha")
+        self.rate = entry["rate"]
+        self.lifetime = entry.get("lifetime", (1.0, 2.0))
+        self.velocity = entry.get("velocity", ((0, 0), (0, 0)))
+        self.acceleration = entry.get("acceleration", (0, 0))
+        # Fraction of a particle owed from earlier frames
+        self.owed = 0.0
+
+def particle_sprite(emitter, level, scale):
+    """Pre-render an emitter's particle at one alpha level"""
+    size = max(1, round(emitter.size * scale))
+    alpha = emitter.alpha * level / (ALPHA_LEVELS - 1)
+    radius = size // 2
+    center = (radius, radius)
+    if emitter.blend == "add":
+        # Additive sprites brighten by their colour, so alpha scales the colour
+        sprite = pygame.Surface((size, size))
+        sprite.fill((0, 0, 0))
+        for step in range(4):
+            # Brighter towards the middle
+            shade = alpha * (step + 1) / 4
+            color = [int(channel * shade) for channel in emitter.color]
+            pygame.draw.circle(sprite, color, center, max(1, radius * (4 - step) // 4))
+    else:
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        color = tuple(emitter.color) + (int(255 * alpha),)
+        if emitter.shape == "ring":
+            pygame.draw.circle(sprite, color, center, radius, max(1, size // 6))
+        else:
+            pygame.draw.circle(sprite, color, center, radius)
+    if pygame.display.get_surface() is not None:
+        sprite = sprite.convert() if emitter.blend == "add" else sprite.convert_alpha()
+    return sprite
+
+class ParticleSystem:
+    """Fixed-capacity particle pool in NumPy arrays, fed by emitters
+
+    Live particles are kept packed at the front of the arrays: emission
+    appends, and expired particles or ones that left the area around the
+    view are removed by compacting the arrays with one mask, so update()
+    does no per-particle Python work. Sprite particles are drawn in a
+    single Surface.blits batch; point particles are added straight into
+    the surface's pixels, as a blit apiece would cost far more than the
+    pixel itself.
+    """
+    def __init__(self, emitters, capacity=PARTICLE_CAPACITY, seed=0):
+        self.emitters = [Emitter(entry) for entry in emitters]
+        self.capacity = capacity
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+        self.positions = np.zeros((capacity, 2), dtype=np.float32)
+        self.velocities = np.zeros((capacity, 2), dtype=np.float32)
+        self.ages = np.zeros(capacity, dtype=np.float32)
+        self.lifetimes = np.ones(capacity, dtype=np.float32)
+        self.alphas = np.zeros(capacity, dtype=np.float32)
+        self.kinds = np.zeros(capacity, dtype=np.int16)
+        self.arrays = (self.positions, self.velocities, self.ages, self.lifetimes, self.kinds)
+
+        # Per-emitter settings, indexed by kind
+        self.accelerations = np.array([emitter.acceleration for emitter in self.emitters],
+                                      dtype=np.float32).reshape(-1, 2)
+        self.peak_alphas = np.array([emitter.alpha for emitter in self.emitters], dtype=np.float32)
+        self.fades = np.array([emitter.fade for emitter in self.emitters], dtype=np.int8)
+        self.points = np.array([emitter.shape == "point" for emitter in self.emitters], dtype=bool)
+        self.point_colors = np.array([emitter.color for emitter in self.emitters], dtype=np.float32).reshape(-1, 3)
+
+        # Sprites for every (kind, alpha level), built for one render scale
+        self.sprites = None
+        self.sprite_flags = None
+        self.sprite_offsets = None
+        self.sprite_scale = None
+        self.emitted = 0
+        self.dropped = 0
+        self.drawn = 0
+
+    def emit(self, kind, count, area):
+        """Add count particles of a kind at random positions in a rect"""
+        room = self.capacity - self.count
+        if count > room:
+            self.dropped += count - room
+            count = room
+        if count <= 0:
+            return
+        emitter = self.emitters[kind]
+        rng = self.rng
+        new = slice(self.count, self.count + count)
+        self.positions[new, 0] = rng.uniform(area.left, area.right, count)
+        self.positions[new, 1] = rng.uniform(area.top, area.bottom, count)
+        (vx_min, vx_max), (vy_min, vy_max) = emitter.velocity
+        self.velocities[new, 0] = rng.uniform(vx_min, vx_max, count)
+        self.velocities[new, 1] = rng.uniform(vy_min, vy_max, count)
+        self.ages[new] = 0.0
+        self.lifetimes[new] = rng.uniform(*emitter.lifetime, count)
+        self.kinds[new] = kind
+        self.count += count
+        self.emitted += count
+
+    def update(self, dt, view):
+        """Emit, move, age and cull particles around a world view rect"""
+        dt = min(dt, MAX_STEP)
+        area = view.inflate(VIEW_MARGIN * 2, VIEW_MARGIN * 2)
+        area_scale = area.width * area.height / RATE_AREA
+        for kind, emitter in enumerate(self.emitters):
+            emitter.owed += emitter.rate * area_scale * dt
+            count = int(emitter.owed)
+            emitter.owed -= count
+            self.emit(kind, count, area)
+
+        n = self.count
+        if not n:
+            return
+        kinds = self.kinds[:n]
+        velocities = self.velocities[:n]
+        positions = self.positions[:n]
+        velocities += self.accelerations[kinds] * dt
+        positions += velocities * dt
+        ages = self.ages[:n]
+        ages += dt
+
+        # Drop expired particles and ones outside the area, keeping the rest packed
+        x, y = positions[:, 0], positions[:, 1]
+        keep = ((ages < self.lifetimes[:n]) & (x >= area.left) & (x < area.right)
+                & (y >= area.top) & (y < area.bottom))
+        if not keep.all():
+            kept = int(np.count_nonzero(keep))
+            for array in self.arrays:
+                array[:kept] = array[:n][keep]
+            n = self.count = kept
+
+        # Alpha from each particle's age and its emitter's fade
+        life = self.ages[:n] / self.lifetimes[:n]
+        fades = self.fades[self.kinds[:n]]
+        envelope = np.where(fades == FADES["out"], 1.0 - life,
+                            np.where(fades == FADES["inout"], 1.0 - np.abs(2.0 * life - 1.0), 1.0))
+        self.alphas[:n] = self.peak_alphas[self.kinds[:n]] * envelope
+
+    def build_sprites(self, scale):
+        sprites = []
+        flags = []
+        offsets = []
+        for emitter in self.emitters:
+            offsets.append(max(1, round(emitter.size * scale)) // 2)
+            for level in range(ALPHA_LEVELS):
+                sprites.append(particle_sprite(emitter, level, scale) if emitter.shape != "point" else None)
+                flags.append(pygame.BLEND_RGB_ADD if emitter.blend == "add" else 0)
+        self.sprites = np.empty(len(sprites), dtype=object)
+        self.sprites[:] = sprites
+        self.sprite_flags = np.array(flags, dtype=np.int32)
+        self.sprite_offsets = np.array(offsets, dtype=np.int32)
+        self.sprite_scale = scale
+
+    def draw(self, surface, view, scale=1.0):
+        """Draw the particles in a world view rect; surface is the view at scale"""
+        n = self.count
+        if not n:
+            return
+        if scale != self.sprite_scale:
+            self.build_sprites(scale)
+        kinds = self.kinds[:n]
+        positions = (self.positions[:n] - view.topleft) * scale
+        peaks = self.peak_alphas[kinds]
+        levels = (self.alphas[:n] / np.maximum(peaks, 1e-6) * (ALPHA_LEVELS - 1) + 0.5).astype(np.int32)
+        width, height = surface.get_size()
+        offsets = self.sprite_offsets[kinds]
+        x, y = positions[:, 0], positions[:, 1]
+        visible = (levels > 0) & (x >= -offsets) & (x < width + offsets) & (y >= -offsets) & (y < height + offsets)
+
+        points = visible & self.points[kinds]
+        if points.any():
+            self.draw_points(surface, positions[points], kinds[points], self.alphas[:n][points])
+
+        sprites = visible & ~points
+        if sprites.any():
+            ids = kinds[sprites].astype(np.int32) * ALPHA_LEVELS + levels[sprites]
+            dests = (positions[sprites] - offsets[sprites][:, None]).astype(np.int32)
+            flags = self.sprite_flags[ids]
+            surface.blits(zip(self.sprites[ids].tolist(), dests.tolist(),
+                              [None] * len(ids), flags.tolist()), doreturn=False)
+        self.drawn = int(np.count_nonzero(visible))
+
+    def draw_points(self, surface, positions, kinds, alphas):
+        """Add single-pixel particles' colours straight into the surface"""
+        width, height = surface.get_size()
+        x = positions[:, 0].astype(np.int32)
+        y = positions[:, 1].astype(np.int32)
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        x, y = x[inside], y[inside]
+        add = (self.point_colors[kinds[inside]] * alphas[inside][:, None]).astype(np.int32)
+        # Particles on the same pixel add up; a fancy-indexed += would keep only one
+        cells, slots = np.unique(x * height + y, return_inverse=True)
+        totals = np.zeros((len(cells), 3), dtype=np.int32)
+        np.add.at(totals, slots, add)
+        x, y = np.divmod(cells, height)
+        pixels = pygame.surfarray.pixels3d(surface)
+        pixels[x, y] = np.minimum(pixels[x, y] + totals, 255)
+        # Unlock the surface for the blits that follow
+        del pixels
+
+    def clear(self):
+        self.count = 0
+
+    def stats(self):
+        """Return particle pool statistics as a dict"""
+        return {
+            'size': self.count,
+            'capacity': self.capacity,
+            'drawn': self.drawn,
+            'emitted': self.emitted,
+            'dropped': self.dropped
+        }
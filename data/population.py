@@ -0,0 +1,280 @@
+import os
+import zlib
+import queue
+import multiprocessing
+import numpy as np
+
+# The world is split into this many regions across and down; each is one
+# shard of the population, simulated as a unit by one worker
+SHARDS = (4, 4)
+# Days between the progress reports a worker streams back
+REPORT_DAYS = 30
+DAYS_PER_YEAR = 365
+# Random change to an NPC's swimming velocity each day, and how much of
+# the velocity is kept from one day to the next
+SWIM_JITTER = 40.0
+SWIM_DAMPING = 0.9
+# Chance per day of an NPC having a life event
+EVENT_CHANCE = 1 / 120
+# Chance per day of an NPC dying at age zero; it doubles every MORTALITY_DOUBLING years
+MORTALITY_BASE = 2e-5
+MORTALITY_DOUBLING = 8.0
+# Event number recorded when an NPC dies
+DIED = -1
+
+NAMES = ("Marina", "Coral", "Nerissa", "Pearl", "Ondine", "Delphine", "Maris", "Thalassa")
+
+# Structured array of what happened to whom during a time skip
+EVENT_DTYPE = np.dtype([("day", np.int32), ("npc", np.int32), ("event", np.int16)])
+
+def npc_name(npc):
+    return f"{NAMES[npc % len(NAMES)]} {npc}"
+
+# Queue the workers report to; set in each worker process by init_worker
+results = None
+
+def init_worker(result_queue):
+    global results
+    results = result_queue
+
+def worker_ready(_):
+    return os.getpid()
+
+def simulate_shard(job):
+    """Advance one shard by a number of days, streaming events to the result queue
+
+    Runs in a worker process. The shard's random numbers depend only on
+    the seed, the skip and the shard, never on which worker runs it, so
+    the outcome is the same for any number of workers.
+    """
+    skip, shard, seed, days, start_day, event_kinds, region, state = job
+    rng = np.random.default_rng([seed, skip, shard])
+    ids = state["ids"]
+    positions = state["positions"]
+    velocities = state["velocities"]
+    ages = state["ages"]
+    alive = state["alive"]
+    event_counts = state["event_counts"]
+    low = np.array(region[:2], dtype=np.float64)
+    high = np.array(region[2:], dtype=np.float64)
+    n = len(ids)
+
+    batch = []
+    for day in range(start_day, start_day + days):
+        # Swim, staying inside the shard's region
+        velocities += rng.normal(0.0, SWIM_JITTER, (n, 2))
+        velocities *= SWIM_DAMPING
+        velocities[~alive] = 0.0
+        positions += velocities
+        np.clip(positions, low, high, out=positions)
+        ages[alive] += 1 / DAYS_PER_YEAR
+
+        # Life events, then deaths, from one draw each per NPC
+        happened = (rng.random(n) < EVENT_CHANCE) & alive
+        count = int(np.count_nonzero(happened))
+        if count:
+            record = np.empty(count, dtype=EVENT_DTYPE)
+            record["day"] = day
+            record["npc"] = ids[happened]
+            record["event"] = rng.integers(event_kinds, size=count)
+            event_counts[happened] += 1
+            batch.append(record)
+        died = (rng.random(n) < MORTALITY_BASE * 2.0 ** (ages / MORTALITY_DOUBLING)) & alive
+        if died.any():
+            alive[died] = False
+            record = np.empty(int(np.count_nonzero(died)), dtype=EVENT_DTYPE)
+            record["day"] = day
+            record["npc"] = ids[died]
+            record["event"] = DIED
+            batch.append(record)
+
+        done = day + 1 - start_day
+        if done % REPORT_DAYS == 0 or done == days:
+            events = np.concatenate(batch) if batch else np.empty(0, dtype=EVENT_DTYPE)
+            results.put(("events", skip, shard, done, events))
+            batch = []
+    results.put(("done", skip, shard, days, state))
+
+class Population:
+    """NPC mermaids in NumPy arrays, advanced through time skips on a process pool
+
+    Each NPC lives in one region of the world, and each region is a
+    shard simulated by a single worker. start_skip() hands every shard
+    to the pool and returns at once; workers stream events and progress
+    back through a queue, and poll() collects them without blocking, so
+    the game keeps running during the skip. Results depend on the seed
+    and never on the number of workers or the order shards finish in.
+    """
+    def __init__(self, size, world_size, seed=0, workers=None, event_kinds=1):
+        self.size = size
+        self.world_size = world_size
+        self.seed = seed
+        self.workers = workers or max(1, (os.cpu_count() or 1) - 1)
+        self.event_kinds = event_kinds
+        rng = np.random.default_rng(seed)
+        self.ids = np.arange(size, dtype=np.int32)
+        self.positions = rng.uniform((0, 0), world_size, (size, 2))
+        self.velocities = np.zeros((size, 2))
+        self.ages = rng.uniform(16, 60, size)
+        self.alive = np.ones(size, dtype=bool)
+        self.event_counts = np.zeros(size, dtype=np.int32)
+
+        # Shards are regions of the world; an NPC stays in the one it starts in
+        columns, rows = SHARDS
+        width, height = world_size[0] / columns, world_size[1] / rows
+        column = np.minimum((self.positions[:, 0] // width).astype(int), columns - 1)
+        row = np.minimum((self.positions[:, 1] // height).astype(int), rows - 1)
+        homes = row * columns + column
+        self.members = [np.flatnonzero(homes == shard) for shard in range(columns * rows)]
+        self.regions = [(shard % columns * width, shard // columns * height,
+                         (shard % columns + 1) * width, (shard // columns + 1) * height)
+                        for shard in range(columns * rows)]
+
+        self.pool = None
+        self.results = None
+        self.pending = None
+        self.day = 0
+        self.skips = 0
+        # The time skip in progress, if any
+        self.skip_days = 0
+        self.shard_days = []
+        self.shards_done = 0
+        self.events = []
+
+    @property
+    def running(self):
+        return self.skip_days > 0
+
+    @property
+    def progress(self):
+        """Fraction of the running time skip done so far"""
+        if not self.running:
+            return 1.0
+        return sum(self.shard_days) / (self.skip_days * len(self.members))
+
+    def start_workers(self, wait=False):
+        """Start the process pool if it isn't running; with wait, until workers take jobs"""
+        if self.pool is None:
+            # Spawned, not forked, so workers don't inherit the game's threads and SDL state
+            context = multiprocessing.get_context("spawn")
+            self.results = context.Queue()
+            self.pool = context.Pool(self.workers, initializer=init_worker, initargs=(self.results,))
+        if wait:
+            self.pool.map(worker_ready, range(self.workers), chunksize=1)
+
+    def start_skip(self, days):
+        """Start simulating days in the background; return False if a skip is already running"""
+        if self.running or days <= 0:
+            return False
+        self.start_workers()
+        self.skip_days = days
+        self.shard_days = [0] * len(self.members)
+        self.shards_done = 0
+        self.events = []
+        jobs = []
+        for shard, members in enumerate(self.members):
+            state = {
+                "ids": self.ids[members],
+                "positions": self.positions[members],
+                "velocities": self.velocities[members],
+                "ages": self.ages[members],
+                "alive": self.alive[members],
+                "event_counts": self.event_counts[members]
+            }
+            jobs.append((self.skips, shard, self.seed, days, self.day, self.event_kinds,
+                         self.regions[shard], state))
+        # Big shards first, so a small one is what's left running at the end
+        jobs.sort(key=lambda job: -len(job[-1]["ids"]))
+        self.pending = self.pool.map_async(simulate_shard, jobs, chunksize=1)
+        return True
+
+    def poll(self, timeout=None):
+        """Collect results streamed back so far; return the new events, by day then NPC
+
+        With a timeout, wait up to that long for the first result.
+        """
+        new_events = []
+        while self.running:
+            try:
+                if timeout is None:
+                    message = self.results.get_nowait()
+                else:
+                    message = self.results.get(timeout=timeout)
+                    timeout = None
+            except queue.Empty:
+                if self.pending.ready() and not self.pending.successful():
+                    # Raise the worker's exception here
+                    self.skip_days = 0
+                    self.pending.get()
+                break
+            kind, skip, shard, days, payload = message
+            if skip != self.skips:
+                continue
+            self.shard_days[shard] = days
+            if kind == "events":
+                new_events.append(payload)
+            else:
+                self.store(shard, payload)
+        if not new_events:
+            return np.empty(0, dtype=EVENT_DTYPE)
+        events = np.concatenate(new_events)
+        events = events[np.lexsort((events["npc"], events["day"]))]
+        self.events.append(events)
+        return events
+
+    def store(self, shard, state):
+        """Take back a finished shard; the skip ends with the last one"""
+        members = self.members[shard]
+        self.positions[members] = state["positions"]
+        self.velocities[members] = state["velocities"]
+        self.ages[members] = state["ages"]
+        self.alive[members] = state["alive"]
+        self.event_counts[members] = state["event_counts"]
+        self.shards_done += 1
+        if self.shards_done == len(self.members):
+            self.day += self.skip_days
+            self.skips += 1
+            self.skip_days = 0
+            self.pending = None
+
+    def finish(self):
+        """Wait for the running time skip; return all of its events, by day then NPC"""
+        while self.running:
+            self.poll(timeout=0.1)
+        if not self.events:
+            return np.empty(0, dtype=EVENT_DTYPE)
+        events = np.concatenate(self.events)
+        return events[np.lexsort((events["npc"], events["day"]))]
+
+    def skip(self, days):
+        """Simulate days and wait for them; return the events"""
+        self.start_skip(days)
+        return self.finish()
+
+    def close(self):
+        """Stop the worker processes, abandoning any skip in progress"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        self.results = None
+        self.pending = None
+        self.skip_days = 0
+
+    def checksum(self):
+        crc = zlib.crc32(self.positions.tobytes())
+        crc = zlib.crc32(self.ages.tobytes(), crc)
+        crc = zlib.crc32(self.alive.tobytes(), crc)
+        return zlib.crc32(self.event_counts.tobytes(), crc)
+
+    def stats(self):
+        """Return population statistics as a dict"""
+        return {
+            'size': self.size,
+            'alive': int(np.count_nonzero(self.alive)),
+            'day': self.day,
+            'skips': self.skips,
+            'shards': len(self.members),
+            'workers': self.workers,
+            'progress': self.progress
+        }
@@ -0,0 +1,192 @@
+import csv
+import time
+import pygame
+from collections import deque
+from text_cache import text_cache
+from text_layout import layouts
+from assets import assets
+from catalog import catalog
+from audio import audio
+
+# Phases of a frame that are timed separately
+PHASES = ("pump", "event", "update", "draw", "flip")
+# Render queue counts kept for each frame
+COUNTERS = ("draw_calls", "blits", "culled")
+# Upper edges (ms) of the frame time histogram buckets; the last bucket is open
+BUCKET_EDGES = (1, 2, 4, 8, 16, 33)
+
+def bucket_index(frame_ms):
+    """Histogram bucket for a frame time"""
+    for i, edge in enumerate(BUCKET_EDGES):
+        if frame_ms < edge:
+            return i
+    return len(BUCKET_EDGES)
+
+class FrameRecord:
+    """Timings for one frame"""
+    __slots__ = ("state", "dt_ms", "frame_ms", "phases", "counts")
+
+    def __init__(self, state, dt_ms, frame_ms, phases, counts):
+        self.state = state
+        self.dt_ms = dt_ms
+        self.frame_ms = frame_ms
+        self.phases = phases
+        self.counts = counts
+
+class FrameProfiler:
+    """Records per-state frame timings in a ring buffer
+
+    Each buffered frame is also counted in a per-state histogram, which
+    is kept up to date as old frames fall out of the buffer.
+    """
+    def __init__(self, capacity=3600, spike_ms=33.3):
+        self.frames = deque(maxlen=capacity)
+        self.histograms = {}
+        self.spike_ms = spike_ms
+        self.spikes = deque(maxlen=20)
+        self.spike_count = 0
+        self.frame_count = 0
+        self.frame_start = None
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.current_counts = dict.fromkeys(COUNTERS, 0)
+
+    def begin_frame(self):
+        """Start timing a new frame"""
+        self.frame_start = time.perf_counter()
+        for phase in PHASES:
+            self.current[phase] = 0.0
+        for counter in COUNTERS:
+            self.current_counts[counter] = 0
+
+    def add(self, phase, seconds):
+        """Add time spent in a phase of the current frame"""
+        self.current[phase] += seconds
+
+    def count(self, counts):
+        """Add render queue counts to the current frame"""
+        for counter in COUNTERS:
+            self.current_counts[counter] += counts[counter]
+
+    def end_frame(self, state, dt):
+        """Finish the current frame and store its record"""
+        if self.frame_start is None:
+            return
+        frame_ms = (time.perf_counter() - self.frame_start) * 1000
+        phases = {phase: self.current[phase] * 1000 for phase in PHASES}
+        record = FrameRecord(state, dt * 1000, frame_ms, phases, dict(self.current_counts))
+
+        # Keep the histograms in step with the ring buffer
+        if len(self.frames) == self.frames.maxlen:
+            old = self.frames[0]
+            self.histograms[old.state][bucket_index(old.frame_ms)] -= 1
+        self.frames.append(record)
+        histogram = self.histograms.setdefault(state, [0] * (len(BUCKET_EDGES) + 1))
+        histogram[bucket_index(frame_ms)] += 1
+
+        if record.dt_ms > self.spike_ms:
+            self.spikes.append((self.frame_count, record))
+            self.spike_count += 1
+        self.frame_count += 1
+        self.frame_start = None
+
+    def averages(self, state=None, last=60):
+        """Average phase and frame times (ms) and render counts over recent frames"""
+        totals = dict.fromkeys(PHASES + COUNTERS, 0.0)
+        totals['frame'] = 0.0
+        totals['dt'] = 0.0
+        count = 0
+        for record in reversed(self.frames):
+            if count >= last:
+                break
+            if state is not None and record.state != state:
+                continue
+            for phase in PHASES:
+                totals[phase] += record.phases[phase]
+            for counter in COUNTERS:
+                totals[counter] += record.counts[counter]
+            totals['frame'] += record.frame_ms
+            totals['dt'] += record.dt_ms
+            count += 1
+        if count:
+            for key in totals:
+                totals[key] /= count
+        return totals
+
+    def get_histogram(self, state):
+        """Frame time bucket counts for a state over the buffered frames"""
+        return self.histograms.get(state, [0] * (len(BUCKET_EDGES) + 1))
+
+    def write_csv(self, path):
+        """Dump the buffered frames to a CSV file"""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "state", "dt_ms", "frame_ms"] + [f"{phase}_ms" for phase in PHASES]
+                            + list(COUNTERS))
+            first = self.frame_count - len(self.frames)
+            for i, record in enumerate(self.frames):
+                row = [first + i, record.state, f"{record.dt_ms:.3f}", f"{record.frame_ms:.3f}"]
+                row += [f"{record.phases[phase]:.3f}" for phase in PHASES]
+                row += [record.counts[counter] for counter in COUNTERS]
+                writer.writerow(row)
+
+class ProfilerOverlay:
+    """On-screen panel showing profiler numbers and cache stats"""
+    def __init__(self, profiler, caches=None):
+        self.profiler = profiler
+        # Objects with a stats() method, shown by name
+        self.caches = caches if caches is not None else {
+            'text': text_cache, 'layouts': layouts, 'assets': assets, 'catalog': catalog, 'audio': audio
+        }
+        self.visible = False
+        self.font = None
+        self.panel = None
+        self.rect = pygame.Rect(0, 0, 270, 268)
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def draw(self, screen, state):
+        """Draw the overlay in the top-right corner of the screen"""
+        if self.font is None:
+            self.font = assets.font(None, 20, owner="profiler")
+            self.panel = pygame.Surface(self.rect.size)
+            self.panel.set_alpha(200)
+        self.rect.topright = (screen.get_width() - 5, 5)
+
+        avg = self.profiler.averages(state)
+        fps = 1000 / avg['dt'] if avg['dt'] else 0.0
+        lines = [
+            f"{state}  {fps:.0f} fps  {avg['frame']:.2f}ms work",
+            "  ".join(f"{phase} {avg[phase]:.2f}" for phase in PHASES[:3]),
+            "  ".join(f"{phase} {avg[phase]:.2f}" for phase in PHASES[3:]),
+            f"draw calls {avg['draw_calls']:.0f}  blits {avg['blits']:.0f}  culled {avg['culled']:.0f}",
+            f"Spikes >{self.profiler.spike_ms:.0f}ms: {self.profiler.spike_count}"
+        ]
+        if self.profiler.spikes:
+            frame, record = self.profiler.spikes[-1]
+            lines.append(f"  last #{frame} {record.state} {record.dt_ms:.1f}ms")
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            lines.append(f"{name}: {stats['size']} items, {stats['hit_rate'] * 100:.0f}% hits")
+
+        self.panel.fill((0, 0, 0))
+        y = 5
+        for line in lines:
+            # These numbers change every frame, so keep them out of the text cache
+            self.panel.blit(self.font.render(line, True, (220, 220, 220)), (5, y))
+            y += 18
+
+        # Frame time histogram for the current state
+        histogram = self.profiler.get_histogram(state)
+        peak = max(histogram) or 1
+        labels = [f"<{edge}" for edge in BUCKET_EDGES] + [f"{BUCKET_EDGES[-1]}+"]
+        bar_width = (self.rect.width - 10) // len(histogram)
+        bottom = self.rect.height - 18
+        for i, count in enumerate(histogram):
+            height = int((bottom - y - 5) * count / peak)
+            bar = pygame.Rect(5 + i * bar_width, bottom - height, bar_width - 4, height)
+            pygame.draw.rect(self.panel, (100, 180, 255), bar)
+            label = text_cache.render(self.font, labels[i], True, (160, 160, 160))
+            self.panel.blit(label, (5 + i * bar_width, bottom + 2))
+
+        screen.blit(self.panel, self.rect)
@@ -0,0 +1,167 @@
+import zlib
+from itertools import compress
+import pygame
+from save import encode_value, decode_value, saves, HEADER
+
+MAGIC = b"TMRP"
+FORMAT_VERSION = 1
+# Ticks between state checksums, so a replay can tell where it diverged
+CHECKPOINT_TICKS = 600
+
+class ReplayError(Exception):
+    """A replay file is damaged or from an unsupported version"""
+
+def encode_event(event):
+    """An event as [type, attributes], keeping only attributes that can be saved"""
+    attributes = {key: value for key, value in event.dict.items()
+                  if isinstance(value, (bool, int, float, str, tuple, list)) or value is None}
+    return [event.type, attributes]
+
+def decode_event(data):
+    event_type, attributes = data
+    # Positions and the like were tuples when recorded
+    attributes = {key: tuple(value) if isinstance(value, list) else value
+                  for key, value in attributes.items()}
+    return pygame.event.Event(event_type, attributes)
+
+def pressed_scancodes(keys):
+    """Indices of the held keys in a pygame.key.get_pressed() result"""
+    return list(compress(range(len(keys)), keys))
+
+def held_keys(scancodes, size=512):
+    """Rebuild a pygame.key.get_pressed() result from held scancodes"""
+    held = [False] * size
+    for scancode in scancodes:
+        held[scancode] = True
+    return pygame.key.ScancodeWrapper(held)
+
+class InputRecorder:
+    """Records the input a session needs to be replayed exactly
+
+    Set as the state manager's input source; it stores the events
+    handled before each fixed tick and the keys held during it (only
+    when they change), plus state checksums every CHECKPOINT_TICKS.
+    Recording starts on the first tick outside skip_states, so the
+    splash screen's background loading doesn't have to be reproduced.
+    """
+    def __init__(self, path, skip_states=("splash",)):
+        self.path = path
+        self.skip_states = skip_states
+        self.start_state = None
+        # Saved values when recording started; states read them on enter
+        self.saved = None
+        # [events, held scancodes or None if unchanged] per tick
+        self.ticks = []
+        self.pending = []
+        self.last_keys = None
+        # [tick, state name, checksum]
+        self.checkpoints = []
+
+    def record_event(self, event):
+        """Note an event about to be handled"""
+        if self.start_state is not None:
+            self.pending.append(encode_event(event))
+
+    def tick(self, state_manager):
+        """Record the start of a fixed tick and return the keys held"""
+        keys = pygame.key.get_pressed()
+        if self.start_state is None:
+            if state_manager.current_state in self.skip_states:
+                return keys
+            self.start_state = state_manager.current_state
+            self.saved = saves.snapshot()
+
+        tick = len(self.ticks)
+        if tick % CHECKPOINT_TICKS == 0:
+            self.checkpoints.append([tick, state_manager.current_state, state_manager.checksum()])
+        held = pressed_scancodes(keys)
+        self.ticks.append([self.pending, None if held == self.last_keys else held])
+        self.pending = []
+        self.last_keys = held
+        return keys
+
+    def save(self, state_manager):
+        """Write the recording, ending with a checksum of the current state"""
+        if self.start_state is None:
+            return
+        self.checkpoints.append([len(self.ticks), state_manager.current_state, state_manager.checksum()])
+        data = encode_value({
+            "start_state": self.start_state,
+            "saved": self.saved,
+            "ticks": self.ticks,
+            "final_events": self.pending,
+            "checkpoints": self.checkpoints
+        }, bytearray())
+        with open(self.path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0))
+            f.write(zlib.compress(data, 9))
+
+class ReplayPlayer:
+    """Feeds a recording back through a game and checks it ends the same way
+
+    Set as the state manager's input source; Game.replay() drives it.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ReplayError(f"{path} is too short to be a replay")
+        magic, version, _ = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ReplayError(f"{path} is not a replay")
+        if version > FORMAT_VERSION:
+            raise ReplayError(f"{path} was written by a newer version ({version})")
+        recording = decode_value(zlib.decompress(data[HEADER.size:]))[0]
+        self.start_state = recording["start_state"]
+        self.saved = recording["saved"]
+        self.ticks = recording["ticks"]
+        self.final_events = recording["final_events"]
+        self.checkpoints = {tick: (name, checksum) for tick, name, checksum in recording["checkpoints"]}
+        self.position = 0
+        self.keys = held_keys(())
+        # (tick, expected state, expected checksum, state, checksum)
+        self.mismatches = []
+
+    def tick(self, state_manager):
+        """Check the state against the recording and return the keys held this tick"""
+        self.verify(state_manager, self.position)
+        held = self.ticks[self.position][1]
+        if held is not None:
+            self.keys = held_keys(held)
+        self.position += 1
+        return self.keys
+
+    def verify(self, state_manager, tick):
+        expected = self.checkpoints.get(tick)
+        if expected:
+            actual = (state_manager.current_state, state_manager.checksum())
+            if actual != expected:
+                self.mismatches.append((tick, *expected, *actual))
+
+    @property
+    def done(self):
+        return self.position >= len(self.ticks)
+
+    def start(self, state_manager):
+        """Restore the saved values the recording started with and enter its first state"""
+        for key, value in self.saved.items():
+            saves.put(key, value)
+        self.position = 0
+        self.keys = held_keys(())
+        self.mismatches = []
+        state_manager.input = self
+        state_manager.change_state(self.start_state)
+
+    def feed_events(self, state_manager):
+        """Handle the events recorded before the next tick"""
+        for event in self.ticks[self.position][0]:
+            state_manager.handle_event(decode_event(event))
+
+    def finish(self, state_manager):
+        """Handle the events after the last tick and check the final state"""
+        state_manager.input = None
+        if not self.done:
+            return
+        for event in self.final_events:
+            state_manager.handle_event(decode_event(event))
+        self.verify(state_manager, self.position)
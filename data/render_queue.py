@@ -0,0 +1,103 @@
+import pygame
+from operator import itemgetter
+from text_cache import text_cache
+
+# Layers, drawn bottom first; items in a layer are drawn by z, then in the
+# order they were submitted
+LAYER_BACKGROUND = 0
+LAYER_WORLD = 10
+LAYER_ENTITIES = 20
+LAYER_UI = 30
+LAYER_OVERLAY = 40
+
+def fill_op(target, color, rect, flags):
+    target.fill(color, rect, flags)
+
+class RenderQueue:
+    """Sprites, text and shapes submitted by a state, drawn in one flush
+
+    States submit what they draw with a layer and z-order instead of
+    drawing it straight away. flush() sorts the queue, skips blits
+    outside the target's clip area, and sends each run of blits in a
+    layer to Surface.blits as one call. Fills, shapes and draw callbacks
+    are drawn in their place in the order, between batches.
+    """
+    def __init__(self):
+        # (layer, z, bounds, op, args); op is None for a blit
+        self.items = []
+        # Counts from the last flush
+        self.counts = {'items': 0, 'culled': 0, 'blits': 0, 'batches': 0, 'draw_calls': 0}
+
+    def blit(self, surface, dest, area=None, flags=0, layer=LAYER_UI, z=0):
+        """Queue a blit; dest is a position or a rect's top-left. Return the screen area covered"""
+        bounds = pygame.Rect(dest[:2], area.size if area else surface.get_size())
+        self.items.append((layer, z, bounds, None, (surface, bounds.topleft, area, flags)))
+        return bounds
+
+    def text(self, font, text, color, layer=LAYER_UI, z=0, **position):
+        """Queue text from the text cache, placed by Rect keywords such as center=(x, y)"""
+        surface = text_cache.render(font, text, True, color)
+        return self.blit(surface, surface.get_rect(**position), layer=layer, z=z)
+
+    def fill(self, color, rect=None, flags=0, layer=LAYER_BACKGROUND, z=0):
+        """Queue filling an area, or the whole target if rect is None"""
+        bounds = None if rect is None else pygame.Rect(rect)
+        self.items.append((layer, z, bounds, fill_op, (color, bounds, flags)))
+
+    def rect(self, color, rect, width=0, layer=LAYER_UI, z=0):
+        """Queue a pygame.draw.rect outline or filled box"""
+        rect = pygame.Rect(rect)
+        self.items.append((layer, z, rect, pygame.draw.rect, (color, rect, width)))
+
+    def draw(self, func, bounds=None, layer=LAYER_WORLD, z=0):
+        """Queue func(target) for drawing that isn't a sprite, e.g. an already batched world
+
+        It is skipped like a sprite when bounds is given and off screen.
+        """
+        if bounds is not None:
+            bounds = pygame.Rect(bounds)
+        self.items.append((layer, z, bounds, func, ()))
+
+    def clear(self):
+        self.items = []
+
+    def flush(self, target):
+        """Draw and clear everything queued; return the counts for it"""
+        items = self.items
+        self.items = []
+        # Stable, so submission order breaks ties
+        items.sort(key=itemgetter(0, 1))
+        clip = target.get_clip()
+        culled = blits = batches = calls = 0
+        batch = []
+        batch_layer = None
+        for layer, z, bounds, op, args in items:
+            if bounds is not None and not clip.colliderect(bounds):
+                culled += 1
+                continue
+            if batch and (op is not None or layer != batch_layer):
+                target.blits(batch, doreturn=False)
+                batches += 1
+                batch = []
+            if op is None:
+                batch.append(args)
+                batch_layer = layer
+                blits += 1
+            else:
+                op(target, *args)
+                calls += 1
+        if batch:
+            target.blits(batch, doreturn=False)
+            batches += 1
+        self.counts = {
+            'items': len(items),
+            'culled': culled,
+            'blits': blits,
+            'batches': batches,
+            'draw_calls': batches + calls
+        }
+        return self.counts
+
+    def stats(self):
+        """Return the last flush's counts as a dict"""
+        return dict(self.counts)
@@ -0,0 +1,349 @@
+import os
+import mmap
+import queue
+import struct
+import zlib
+import threading
+
+# Saves live next to the game, outside the data package
+SAVE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "saves")
+
+MAGIC = b"TMSV"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHH")  # magic, version, reserved
+CRC = struct.Struct("<I")
+
+# Record operations
+OP_SET = 1
+OP_DELETE = 2
+
+# Compact the journal into the snapshot once it grows past this many bytes
+COMPACT_AT = 256 * 1024
+
+class SaveError(Exception):
+    """A save file is damaged or from an unsupported version"""
+
+# Value encoding: one tag byte, then a varint or length-prefixed body
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+def encode_value(value, out):
+    """Append the binary encoding of a value to a bytearray"""
+    if value is None:
+        out.append(ord("N"))
+    elif value is True:
+        out.append(ord("T"))
+    elif value is False:
+        out.append(ord("F"))
+    elif isinstance(value, int):
+        out.append(ord("i"))
+        # Zigzag so small negative numbers stay short
+        write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+    elif isinstance(value, float):
+        out.append(ord("f"))
+        out += struct.pack("<d", value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        out.append(ord("s"))
+        write_varint(out, len(data))
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(ord("b"))
+        write_varint(out, len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        out.append(ord("l"))
+        write_varint(out, len(value))
+        for item in value:
+            encode_value(item, out)
+    elif isinstance(value, dict):
+        out.append(ord("d"))
+        write_varint(out, len(value))
+        for key, item in value.items():
+            encode_value(key, out)
+            encode_value(item, out)
+    else:
+        raise TypeError(f"Can't save values of type {type(value).__name__}")
+    return out
+
+def decode_value(data, pos=0):
+    """Decode one value from data at pos; return (value, next pos)"""
+    tag = chr(data[pos])
+    pos += 1
+    if tag == "N":
+        return None, pos
+    if tag == "T":
+        return True, pos
+    if tag == "F":
+        return False, pos
+    if tag == "i":
+        raw, pos = read_varint(data, pos)
+        return (raw >> 1) ^ -(raw & 1), pos
+    if tag == "f":
+        return struct.unpack_from("<d", data, pos)[0], pos + 8
+    if tag in "sb":
+        length, pos = read_varint(data, pos)
+        raw = bytes(data[pos:pos + length])
+        return (raw.decode("utf-8") if tag == "s" else raw), pos + length
+    if tag == "l":
+        count, pos = read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = decode_value(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == "d":
+        count, pos = read_varint(data, pos)
+        result = {}
+        for _ in range(count):
+            key, pos = decode_value(data, pos)
+            result[key], pos = decode_value(data, pos)
+        return result, pos
+    raise SaveError(f"Unknown value tag {tag!r}")
+
+def encode_record(op, key, payload=b""):
+    """One journal/snapshot record, ending in a CRC of its contents"""
+    record = bytearray([op])
+    key_data = key.encode("utf-8")
+    write_varint(record, len(key_data))
+    record += key_data
+    write_varint(record, len(payload))
+    record += payload
+    record += CRC.pack(zlib.crc32(record))
+    return bytes(record)
+
+def read_records(data, pos):
+    """Yield (op, key, payload) from data, stopping at a torn or damaged record"""
+    end = len(data)
+    while pos < end:
+        try:
+            start = pos
+            op = data[pos]
+            key_length, pos = read_varint(data, pos + 1)
+            key = bytes(data[pos:pos + key_length]).decode("utf-8")
+            pos += key_length
+            payload_length, pos = read_varint(data, pos)
+            payload = data[pos:pos + payload_length]
+            pos += payload_length
+            if pos + CRC.size > end:
+                return
+            (crc,) = CRC.unpack_from(data, pos)
+            if crc != zlib.crc32(data[start:pos]):
+                return
+            pos += CRC.size
+        except (IndexError, UnicodeDecodeError):
+            return
+        yield op, key, payload
+
+def check_header(data, path):
+    if len(data) < HEADER.size:
+        raise SaveError(f"{path} is too short to be a save file")
+    magic, version, _ = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise SaveError(f"{path} is not a save file")
+    if version > FORMAT_VERSION:
+        raise SaveError(f"{path} was written by a newer version ({version})")
+    return version
+
+class SaveManager:
+    """Key/value game saves in a compact binary format
+
+    A save is a snapshot file plus an append-only journal of changes.
+    put() returns straight away; a background thread encodes values,
+    skips unchanged ones and appends the rest to the journal, compacting
+    it into a new snapshot when it grows. Snapshots are memory-mapped and
+    values are only decoded when first asked for.
+
+    Until open() is called, saves are kept in memory only.
+    """
+    def __init__(self, directory=SAVE_DIR, slot="save"):
+        self.snapshot_path = os.path.join(directory, slot + ".dat")
+        self.journal_path = os.path.join(directory, slot + ".journal")
+        self.directory = directory
+        # Latest value of each key; put() only touches this, so it never
+        # waits on the writer thread
+        self.values = {}
+        # Encoded payload of every stored key (memoryviews into the snapshot map)
+        self.payloads = {}
+        # Guards payloads and the snapshot map
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.thread = None
+        self.journal = None
+        self.snapshot_map = None
+        self.snapshot_file = None
+
+    def open(self):
+        """Load the save from disk and start the background writer"""
+        if self.thread:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.load_snapshot()
+        self.load_journal()
+        self.thread = threading.Thread(target=self.run_writer, name="autosave", daemon=True)
+        self.thread.start()
+
+    def load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        self.snapshot_file = open(self.snapshot_path, "rb")
+        if os.fstat(self.snapshot_file.fileno()).st_size == 0:
+            return
+        self.snapshot_map = mmap.mmap(self.snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.snapshot_map)
+        check_header(view, self.snapshot_path)
+        for op, key, payload in read_records(view, HEADER.size):
+            if op == OP_SET:
+                self.payloads[key] = payload
+
+    def load_journal(self):
+        exists = os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > 0
+        if exists:
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+            check_header(data, self.journal_path)
+            for op, key, payload in read_records(data, HEADER.size):
+                if op == OP_SET:
+                    self.payloads[key] = payload
+                else:
+                    self.payloads.pop(key, None)
+        self.journal = open(self.journal_path, "ab")
+        if not exists:
+            self.journal.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0))
+            self.journal.flush()
+
+    def get(self, key, default=None):
+        """Return a saved value, decoding it on first use"""
+        if key in self.values:
+            return self.values[key]
+        with self.lock:
+            payload = self.payloads.get(key)
+            if payload is None:
+                return default
+            value = decode_value(payload)[0]
+            self.values[key] = value
+            return value
+
+    def snapshot(self):
+        """Every saved value, decoded"""
+        with self.lock:
+            keys = set(self.payloads)
+        keys.update(self.values)
+        return {key: self.get(key) for key in keys}
+        
+    def put(self, key, value):
+        """Save a value in the background
+
+        The value is encoded later on the writer thread, so pass a fresh
+        object rather than one that will keep changing.
+        """
+        self.values[key] = value
+        if self.thread:
+            self.queue.put((OP_SET, key, value))
+
+    def delete(self, key):
+        """Remove a saved value"""
+        self.values.pop(key, None)
+        if not self.thread:
+            with self.lock:
+                self.payloads.pop(key, None)
+        else:
+            self.queue.put((OP_DELETE, key, None))
+
+    def run_writer(self):
+        """Writer thread: append changed values to the journal"""
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                self.write(*item)
+            finally:
+                self.queue.task_done()
+
+    def write(self, op, key, value):
+        if op == OP_SET:
+            payload = bytes(encode_value(value, bytearray()))
+            if self.payloads.get(key) == payload:
+                # Unchanged since it was last written
+                return
+            record = encode_record(OP_SET, key, payload)
+        else:
+            if key not in self.payloads:
+                return
+            payload = None
+            record = encode_record(OP_DELETE, key)
+
+        self.journal.write(record)
+        self.journal.flush()
+        with self.lock:
+            if payload is None:
+                self.payloads.pop(key, None)
+            else:
+                self.payloads[key] = payload
+        if self.journal.tell() > COMPACT_AT:
+            self.compact()
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and empty the journal"""
+        temp_path = self.snapshot_path + ".tmp"
+        with self.lock:
+            self.close_snapshot()
+            with open(temp_path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0))
+                for key, payload in self.payloads.items():
+                    f.write(encode_record(OP_SET, key, payload))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+
+        self.journal.close()
+        self.journal = open(self.journal_path, "wb")
+        self.journal.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0))
+        self.journal.flush()
+
+    def close_snapshot(self):
+        if self.snapshot_map:
+            # Payloads may point into the map, so copy them before closing it
+            self.payloads = {key: bytes(payload) for key, payload in self.payloads.items()}
+            self.snapshot_map.close()
+            self.snapshot_map = None
+        if self.snapshot_file:
+            self.snapshot_file.close()
+            self.snapshot_file = None
+
+    def flush(self):
+        """Wait until every queued save has been written"""
+        if self.thread:
+            self.queue.join()
+
+    def close(self):
+        """Write pending saves, compact and stop the writer"""
+        if not self.thread:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        if self.journal.tell() > HEADER.size:
+            self.compact()
+        self.journal.close()
+        self.journal = None
+        self.close_snapshot()
+
+# Shared instance used by every state
+saves = SaveManager()
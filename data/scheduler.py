@@ -0,0 +1,114 @@
+import heapq
+import itertools
+
+class Timer:
+    """A scheduled callback; keep it to cancel the callback later"""
+    __slots__ = ("due", "interval", "callback", "args", "owner", "cancelled")
+
+    def __init__(self, due, interval, callback, args, owner):
+        self.due = due
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.owner = owner
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+class Timeline:
+    """A clock and heap of timers for one owner"""
+    def __init__(self):
+        self.time = 0.0
+        self.paused = False
+        self.heap = []
+
+class Scheduler:
+    """Runs one-shot and recurring callbacks when they fall due
+
+    Each owner (usually a state name, or None for global timers) has its
+    own timeline that can be paused. Timers wait in a heap, so nothing is
+    checked per frame except the earliest due time of each timeline.
+    """
+    def __init__(self):
+        self.timelines = {}
+        # Breaks ties between timers due at the same time, in schedule order
+        self.counter = itertools.count()
+
+    def timeline(self, owner):
+        timeline = self.timelines.get(owner)
+        if timeline is None:
+            timeline = self.timelines[owner] = Timeline()
+        return timeline
+
+    def schedule(self, delay, callback, *args, owner=None):
+        """Call callback(*args) once, delay seconds from now on owner's clock"""
+        return self.add(delay, None, callback, args, owner)
+
+    def every(self, interval, callback, *args, owner=None, delay=None):
+        """Call callback(*args) every interval seconds (first after delay)"""
+        if interval <= 0:
+            raise ValueError("Timer interval must be positive")
+        first = interval if delay is None else delay
+        return self.add(first, interval, callback, args, owner)
+
+    def add(self, delay, interval, callback, args, owner):
+        timeline = self.timeline(owner)
+        timer = Timer(timeline.time + delay, interval, callback, args, owner)
+        heapq.heappush(timeline.heap, (timer.due, next(self.counter), timer))
+        return timer
+
+    def cancel(self, timer):
+        """Stop a timer; it is dropped from the heap when it comes due"""
+        timer.cancel()
+
+    def clear(self, owner):
+        """Cancel every timer of an owner and reset its clock"""
+        timeline = self.timelines.pop(owner, None)
+        if timeline:
+            for _, _, timer in timeline.heap:
+                timer.cancel()
+
+    def pause(self, owner):
+        self.timeline(owner).paused = True
+
+    def resume(self, owner):
+        self.timeline(owner).paused = False
+
+    def time(self, owner=None):
+        """Seconds an owner's clock has run (excluding pauses)"""
+        timeline = self.timelines.get(owner)
+        return timeline.time if timeline else 0.0
+
+    def next_due(self, owners=None):
+        """Seconds until the next timer of owners (all if None) falls due, or None"""
+        soonest = None
+        for owner in (self.timelines if owners is None else owners):
+            timeline = self.timelines.get(owner)
+            if timeline is None or timeline.paused or not timeline.heap:
+                continue
+            wait = max(0.0, timeline.heap[0][0] - timeline.time)
+            if soonest is None or wait < soonest:
+                soonest = wait
+        return soonest
+        
+    def update(self, dt, owners=None):
+        """Advance the clocks of owners (all owners if None) and run due timers"""
+        names = list(self.timelines) if owners is None else owners
+        for owner in names:
+            timeline = self.timelines.get(owner)
+            if timeline is None or timeline.paused:
+                continue
+            timeline.time += dt
+            heap = timeline.heap
+            while heap and heap[0][0] <= timeline.time:
+                _, _, timer = heapq.heappop(heap)
+                if timer.cancelled:
+                    continue
+                timer.callback(*timer.args)
+                if timer.interval is not None and not timer.cancelled:
+                    timer.due += timer.interval
+                    heapq.heappush(heap, (timer.due, next(self.counter), timer))
+                # A callback may have cleared or paused this timeline
+                if self.timelines.get(owner) is not timeline or timeline.paused:
+                    break
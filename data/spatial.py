@@ -0,0 +1,129 @@
+import numpy as np
+
+# Neighbouring cells checked for collision pairs; only "forward" neighbours
+# so each pair of cells is visited once
+FORWARD_NEIGHBOURS = ((1, 0), (-1, 1), (0, 1), (1, 1))
+
+class SpatialHash:
+    """Buckets entity ids by grid cell for proximity and collision queries
+
+    Entities are only moved between buckets when they cross a cell
+    border, so keeping the index current is cheap when most entities
+    stay inside their cell from one tick to the next.
+    """
+    def __init__(self, cell_size=50):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entity_cells = {}
+        # Cell coordinates of each store row, and whether it is indexed,
+        # as of the last sync
+        self.synced_cells = np.zeros((0, 2), dtype=np.int64)
+        self.synced_alive = np.zeros(0, dtype=bool)
+
+    def cell_of(self, x, y):
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def insert(self, entity_id, x, y):
+        """Add an entity, or move it if it is already indexed"""
+        self.move_to_cell(entity_id, self.cell_of(x, y))
+
+    def move_to_cell(self, entity_id, cell):
+        old = self.entity_cells.get(entity_id)
+        if old == cell:
+            return
+        if old is not None:
+            bucket = self.cells[old]
+            bucket.discard(entity_id)
+            if not bucket:
+                del self.cells[old]
+        self.cells.setdefault(cell, set()).add(entity_id)
+        self.entity_cells[entity_id] = cell
+
+    def remove(self, entity_id):
+        """Drop an entity from the index"""
+        cell = self.entity_cells.pop(entity_id, None)
+        if cell is not None:
+            bucket = self.cells[cell]
+            bucket.discard(entity_id)
+            if not bucket:
+                del self.cells[cell]
+
+    def sync(self, store):
+        """Bring the index up to date with an EntityStore, using row numbers as ids
+
+        Don't mix this with insert()/remove() calls on the same index.
+        """
+        n = store.count
+        cells = (store.positions[:n] // self.cell_size).astype(np.int64)
+        alive = store.alive[:n].copy()
+
+        # Only rows that spawned, died or changed cell need any Python work
+        was_alive = np.zeros(n, dtype=bool)
+        common = min(len(self.synced_alive), n)
+        was_alive[:common] = self.synced_alive[:common]
+        changed = alive != was_alive
+        changed[:common] |= alive[:common] & (cells[:common] != self.synced_cells[:common]).any(axis=1)
+        for index in np.flatnonzero(changed).tolist():
+            if alive[index]:
+                self.move_to_cell(index, (int(cells[index, 0]), int(cells[index, 1])))
+            else:
+                self.remove(index)
+        self.synced_cells = cells
+        self.synced_alive = alive
+
+    def query_rect(self, rect):
+        """Ids of entities in cells overlapping a pygame Rect (candidates, not exact)"""
+        size = self.cell_size
+        found = []
+        for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    found.extend(bucket)
+        return found
+
+    def query_radius(self, store, x, y, radius):
+        """Row numbers of entities whose centre is within radius of (x, y)"""
+        size = self.cell_size
+        candidates = []
+        for cx in range(int((x - radius) // size), int((x + radius) // size) + 1):
+            for cy in range(int((y - radius) // size), int((y + radius) // size) + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    candidates.extend(bucket)
+        if not candidates:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.array(candidates)
+        offset = store.positions[candidates] - (x, y)
+        close = offset[:, 0] ** 2 + offset[:, 1] ** 2 <= radius * radius
+        return candidates[close]
+
+    def candidate_pairs(self):
+        """(a, b) id pairs sharing a cell or in neighbouring cells, each once
+
+        Assumes no entity is wider than a cell.
+        """
+        pairs = []
+        cells = self.cells
+        for (cx, cy), bucket in cells.items():
+            members = sorted(bucket)
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    pairs.append((a, b))
+            for dx, dy in FORWARD_NEIGHBOURS:
+                other = cells.get((cx + dx, cy + dy))
+                if other:
+                    pairs.extend((a, b) for a in members for b in other)
+        return pairs
+
+    def collisions(self, store):
+        """Candidate pairs whose circles actually overlap, as an (N, 2) array"""
+        pairs = self.candidate_pairs()
+        if not pairs:
+            return np.zeros((0, 2), dtype=np.int64)
+        pairs = np.array(pairs)
+        a, b = pairs[:, 0], pairs[:, 1]
+        offset = store.positions[a] - store.positions[b]
+        reach = (store.sizes[a] + store.sizes[b]) / 2
+        hit = offset[:, 0] ** 2 + offset[:, 1] ** 2 <= reach * reach
+        return pairs[hit]
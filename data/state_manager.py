@@ -1,49 +1,291 @@
+import time
+import importlib
 import pygame
+from assets import assets
+from scheduler import Scheduler
+from render_queue import RenderQueue
+
+# Past this many dirty regions in one frame, redraw the whole screen instead
+MAX_DIRTY_RECTS = 32
+# Seconds a lazily created state may sit unused before it is released
+RELEASE_AFTER = 60.0
 
 class StateManager:
     def __init__(self):
+        # Created states by name
         self.states = {}
+        # Factories for states that are created on first use
+        self.factories = {}
+        # When each inactive state was last left
+        self.inactive_since = {}
+        # Seconds spent creating each state
+        self.creation_times = {}
+        self.release_timer = 0.0
         self.current_state = None
         self.next_state = None
+        # How next_state is entered: "change", "push" or "pop"
+        self.transition = None
+        # Suspended states under the current one, bottom first
+        self.stack = []
+        # Size of the frames drawn so far, for snapshots of suspended states
+        self.frame_size = None
+        # Fraction of a fixed update step since the last update, for drawing
+        self.interpolation = 1.0
+        # Optional FrameProfiler that records time spent in each phase
+        self.profiler = None
+        # Timers for every state; a state's clock only runs while it is current
+        self.scheduler = Scheduler()
+        # Keys held during the current tick. They come from the input source
+        # if one is set (an InputRecorder or ReplayPlayer), else from pygame
+        self.keys = None
+        self.input = None
+        # The game's Display, for states that change or depend on its settings
+        self.display = None
+        # What states draw is submitted here and drawn after their draw()
+        self.render_queue = RenderQueue()
         
     def add_state(self, name, state):
-        """Add a state to the manager"""
+        """Add a state to the manager
+        
+        state can be a state object, a factory (such as a state class)
+        or a "module:Class" path. Factories and paths are only called
+        when the state is first entered.
+        """
+        if isinstance(state, str) or callable(state):
+            self.factories[name] = state
+        else:
+            self.register(name, state)
+            
+    def register(self, name, state):
+        """Attach a created state to the manager"""
         self.states[name] = state
+        state.name = name
         state.state_manager = self
         
+    def has_state(self, name):
+        """Whether a state is registered, created or not"""
+        return name in self.states or name in self.factories
+        
+    def get_state(self, name):
+        """Return a state, creating it if it was registered lazily"""
+        state = self.states.get(name)
+        if state is None:
+            state = self.build_state(name)
+            self.register(name, state)
+        return state
+        
+    def build_state(self, name):
+        """Create a lazily registered state without attaching it
+        
+        Safe to call from a loader thread; register() the result on the
+        main thread.
+        """
+        start = time.perf_counter()
+        factory = self.factories[name]
+        if isinstance(factory, str):
+            module_name, class_name = factory.split(":")
+            factory = getattr(importlib.import_module(module_name), class_name)
+        state = factory()
+        self.creation_times[name] = time.perf_counter() - start
+        return state
+        
     def change_state(self, state_name):
-        """Queue a state change"""
-        if state_name in self.states:
+        """Queue a state change, leaving the current and any suspended states"""
+        if self.has_state(state_name):
             self.next_state = state_name
+            self.transition = "change"
+            
+    def push_state(self, state_name):
+        """Queue entering a state over the current one, which is suspended
+        
+        The suspended state keeps its objects and is resumed, not entered
+        again, by pop_state(). The pushed state gets a snapshot of its
+        last frame as frozen_frame to draw over.
+        """
+        if self.has_state(state_name):
+            self.next_state = state_name
+            self.transition = "push"
+            
+    def pop_state(self):
+        """Queue leaving the current state and resuming the one below"""
+        if self.stack:
+            self.next_state = self.stack[-1]
+            self.transition = "pop"
+            
+    def exit_all(self):
+        """Exit the current state and every suspended one"""
+        while self.current_state:
+            self.leave_current()
+            self.current_state = self.stack.pop() if self.stack else None
+            
+    def leave_current(self):
+        state = self.states[self.current_state]
+        state.exit()
+        state.frozen_frame = None
+        assets.release(self.current_state)
+        self.inactive_since[self.current_state] = time.perf_counter()
+        
+    def snapshot(self, state):
+        """Draw a state to a new surface the size of the screen, or None before any drawing"""
+        if not self.frame_size:
+            return None
+        surface = pygame.Surface(self.frame_size)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        self.render(state, surface)
+        return surface
+        
+    def render(self, state, surface):
+        """Have a state submit its drawing and flush it to a surface; return the draw counts"""
+        self.render_queue.clear()
+        state.draw(surface)
+        return self.render_queue.flush(surface)
+        
+    def release_inactive(self, now=None):
+        """Drop lazily created states that have been unused for a while"""
+        now = time.perf_counter() if now is None else now
+        for name, since in list(self.inactive_since.items()):
+            state = self.states.get(name)
+            if state is None or state.keep_alive or name == self.next_state:
+                continue
+            if name in self.factories and now - since >= RELEASE_AFTER:
+                del self.states[name]
+                del self.inactive_since[name]
+                self.scheduler.clear(name)
             
     def update(self, dt):
         """Update current state and handle state changes"""
         # Handle state transitions
         if self.next_state:
-            if self.current_state:
-                self.states[self.current_state].exit()
-            self.current_state = self.next_state
-            self.states[self.current_state].enter()
+            if self.transition == "pop":
+                self.leave_current()
+                self.current_state = self.stack.pop()
+                state = self.states[self.current_state]
+                state.resume()
+            else:
+                frozen_frame = None
+                if self.transition == "push" and self.current_state:
+                    suspended = self.states[self.current_state]
+                    suspended.suspend()
+                    frozen_frame = self.snapshot(suspended)
+                    self.stack.append(self.current_state)
+                else:
+                    self.exit_all()
+                self.current_state = self.next_state
+                self.inactive_since.pop(self.current_state, None)
+                state = self.get_state(self.current_state)
+                assets.preload(self.current_state, state.manifest)
+                if not state.data_loaded:
+                    state.load_data()
+                    state.data_loaded = True
+                state.frozen_frame = frozen_frame
+                state.enter()
+            state.mark_dirty()
+            # Assets shared with the new state were re-acquired by now
+            assets.evict_unused()
             self.next_state = None
+            self.transition = None
             
-        # Update current state
+        self.keys = self.input.tick(self) if self.input else pygame.key.get_pressed()
+            
+        # Check for unused states about once a second
+        self.release_timer += dt
+        if self.release_timer >= 1.0:
+            self.release_timer = 0.0
+            self.release_inactive()
+            
+        # Run due timers (global ones and the current state's), then update
+        self.scheduler.update(dt, (None, self.current_state))
         if self.current_state:
+            start = time.perf_counter()
             self.states[self.current_state].update(dt)
+            self.record("update", start)
             
-    def draw(self, screen):
-        """Draw current state"""
-        if self.current_state:
-            self.states[self.current_state].draw(screen)
+    def idle(self, dt):
+        """Let time pass while the current state sleeps, without updating it
+        
+        Only timers change an idle state, so its clocks advance and due
+        timers run, but no update steps are spent catching up.
+        """
+        self.release_timer += dt
+        self.scheduler.update(dt, (None, self.current_state))
+            
+    def draw(self, screen, dirty_only=False):
+        """Draw current state and return the screen regions it changed
+        
+        With dirty_only set, the state is only drawn when it reported
+        changes, and drawing is clipped to the changed regions.
+        """
+        if not self.current_state:
+            return []
+            
+        self.frame_size = screen.get_size()
+        state = self.states[self.current_state]
+        rects = state.pop_dirty_rects(screen.get_rect())
+        start = time.perf_counter()
+        counts = None
+        if not dirty_only:
+            counts = self.render(state, screen)
+        elif rects:
+            # Queued items outside the changed regions are culled
+            screen.set_clip(rects[0].unionall(rects[1:]))
+            counts = self.render(state, screen)
+            screen.set_clip(None)
+        self.record("draw", start)
+        if counts and self.profiler:
+            self.profiler.count(counts)
+        return rects
             
     def handle_event(self, event):
         """Pass events to current state"""
         if self.current_state:
+            start = time.perf_counter()
             self.states[self.current_state].handle_event(event)
+            self.record("event", start)
+            
+    def mark_dirty(self, rect=None):
+        """Mark a region of the current state for redrawing"""
+        if self.current_state:
+            self.states[self.current_state].mark_dirty(rect)
+            
+    def checksum(self):
+        """Checksum of the current state's simulation data"""
+        if not self.current_state:
+            return 0
+        return self.states[self.current_state].checksum()
+            
+    def record(self, phase, start):
+        """Report time since start to the profiler, if there is one"""
+        if self.profiler:
+            self.profiler.add(phase, time.perf_counter() - start)
 
 class BaseState:
     """Base class for all game states"""
+    # Assets loaded before enter(), as (kind, *args) tuples for AssetManager.load
+    manifest = ()
+    # Lazily created states are released after a while unused, unless this is set
+    keep_alive = False
+    # States that only change in response to input or timers can clear this,
+    # so the game sleeps between events while they are current
+    animating = True
+    # Frame rate cap while this state is current
+    frame_rate = 60
+    
     def __init__(self):
+        self.name = None
         self.state_manager = None
+        self.data_loaded = False
+        self.dirty_rects = []
+        self.full_redraw = True
+        # Snapshot of the state below, when pushed over one
+        self.frozen_frame = None
+        
+    def load_data(self):
+        """Load slow data (files, world tables) needed before the first enter
+        
+        May run on a loader thread, so it should only touch this state.
+        """
+        pass
         
     def enter(self):
         """Called when entering this state"""
@@ -53,14 +295,55 @@ class BaseState:
         """Called when leaving this state"""
         pass
         
+    def suspend(self):
+        """Called when another state is pushed over this one"""
+        pass
+        
+    def resume(self):
+        """Called when this state is current again after being suspended"""
+        pass
+        
     def update(self, dt):
         """Update state logic"""
         pass
         
+    def checksum(self):
+        """CRC of the data that decides how this state plays out
+        
+        Replays compare it to check a session played out the same way.
+        States whose updates depend only on input can leave it at 0.
+        """
+        return 0
+        
     def draw(self, screen):
-        """Draw state to screen"""
+        """Draw state to screen, or submit it to state_manager.render_queue
+        
+        The queue is flushed to the screen after draw() returns.
+        """
         pass
         
     def handle_event(self, event):
         """Handle pygame events"""
-        pass
\ No newline at end of file
+        pass
+        
+    def mark_dirty(self, rect=None):
+        """Record a changed screen region (the whole screen if rect is None)"""
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.dirty_rects.append(pygame.Rect(rect))
+            
+    def needs_redraw(self):
+        """Whether anything was marked dirty since the last draw"""
+        return self.full_redraw or bool(self.dirty_rects)
+        
+    def pop_dirty_rects(self, screen_rect):
+        """Return and clear the regions changed since the last draw"""
+        if self.full_redraw or len(self.dirty_rects) > MAX_DIRTY_RECTS:
+            rects = [screen_rect.copy()]
+        else:
+            rects = [rect.clip(screen_rect) for rect in self.dirty_rects]
+            rects = [rect for rect in rects if rect.width and rect.height]
+        self.dirty_rects = []
+        self.full_redraw = False
+        return rects
@@ -1,111 +1,432 @@
+import random
+import time
+import zlib
 import pygame
 from state_manager import BaseState
+from assets import assets
+from entities import EntityStore, EntityHandle, WANDER
+from spatial import SpatialHash
+from save import saves
+from catalog import catalog
+from world import Camera, ChunkedWorld
+from particles import ParticleSystem
+from render_queue import LAYER_WORLD, LAYER_ENTITIES, LAYER_OVERLAY
+from population import Population, npc_name, DAYS_PER_YEAR, DIED
 
-class Player:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.speed = 200  # pixels per second
-        self.size = 30
-        
+# Cell size of the spatial index
+GRID_SIZE = 50
+# Size of the screen's view of the world
+VIEW_SIZE = (800, 600)
+# Creatures start spread over this area around the player
+SPAWN_AREA = (1600, 1200)
+# Creatures this close to the player count as nearby
+NEARBY_RADIUS = 80
+# Seconds of play per year of the character's life
+YEAR_LENGTH = 60.0
+# Seconds between high and low tide
+TIDE_LENGTH = 45.0
+# Range of seconds between life-changing events, and how long one is shown
+EVENT_DELAY = (20.0, 60.0)
+EVENT_DISPLAY_TIME = 4.0
+# Seconds of play between autosaves
+AUTOSAVE_INTERVAL = 10.0
+# Mermaids living on the reef, simulated only during time skips
+NPC_COUNT = 400
+# Seconds a time skip lasts in recorded and replayed sessions, so it ends
+# on the same tick in both
+RECORDED_SKIP_TIME = 5.0
+
+# Entity kind of the player, who is drawn separately; creature kinds come from the species table
+PLAYER_KIND = 0
+
+class Player(EntityHandle):
+    """The player's row in the entity store"""
+    __slots__ = ()
+    
     def update(self, dt, keys):
-        # Handle movement
+        # Handle movement; the entity store moves and clamps the player
+        vx = vy = 0
         if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            self.x -= self.speed * dt
+            vx -= self.speed
         if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            self.x += self.speed * dt
+            vx += self.speed
         if keys[pygame.K_UP] or keys[pygame.K_w]:
-            self.y -= self.speed * dt
+            vy -= self.speed
         if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-            self.y += self.speed * dt
-            
-        # Keep player on screen
-        self.x = max(self.size//2, min(800 - self.size//2, self.x))
-        self.y = max(self.size//2, min(600 - self.size//2, self.y))
+            vy += self.speed
+        self.set_velocity(vx, vy)
         
-    def draw(self, screen):
-        pygame.draw.circle(screen, (100, 150, 255), (int(self.x), int(self.y)), self.size//2)
-        pygame.draw.circle(screen, (255, 255, 255), (int(self.x), int(self.y)), self.size//2, 3)
+    def get_position(self, alpha=1.0):
+        """Position interpolated between the last two updates"""
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
+        return int(x), int(y)
+        
+    def get_rect(self, alpha=1.0):
+        """World area covered by the player"""
+        rect = pygame.Rect(0, 0, self.size + 2, self.size + 2)
+        rect.center = self.get_position(alpha)
+        return rect
+        
+    def make_sprite(self):
+        """Pre-rendered look of the player"""
+        radius = max(1, self.size // 2)
+        sprite = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, (100, 150, 255), (radius, radius), radius)
+        pygame.draw.circle(sprite, (255, 255, 255), (radius, radius), radius, 3)
+        return sprite
 
 class GameState(BaseState):
+    manifest = (
+        ("font", None, 36),
+        ("font", None, 24)
+    )
+    # Holds game progress, so never release it
+    keep_alive = True
+    
     def __init__(self):
         super().__init__()
         self.font = None
         self.small_font = None
         self.player = None
+        self.entities = None
+        self.creature_count = 300
+        # Content tables, from load_data()
+        self.species = []
+        self.emitters = []
+        self.npc_events = []
+        self.life_events = []
+        self.creature_sprites = {}
+        # The world view when rendering below full resolution
+        self.world_surface = None
+        self.spatial = None
+        self.nearby = []
+        self.world = None
+        self.camera = None
+        # Bubbles, plankton and caustics; visual only, so they never affect the simulation
+        self.particles = None
+        self.particle_time = None
         self.score = 0
-        self.game_time = 0
-        self.paused = False
+        self.age = 16
+        self.high_tide = False
+        self.event_message = None
+        self.population = None
+        # Latest news from a running time skip
+        self.skip_news = None
+        # Game time left before a recorded time skip ends, or None
+        self.skip_time_left = None
+        self.rng = random.Random(0)
+        # Score, time and nearby text are redrawn every frame
+        self.hud_rect = pygame.Rect(0, 0, 300, 130)
+        self.drawn_player_rect = None
+        # Set to pick up saved progress on the next enter()
+        self.load_saved = False
+        
+    def load_data(self):
+        self.species = catalog.table("species").tagged("creature")
+        self.emitters = catalog.table("emitters").tagged("ambient")
+        events = catalog.table("events")
+        self.npc_events = events.tagged("npc")
+        self.life_events = events.tagged("life")
         
     def enter(self):
-        self.font = pygame.font.Font(None, 36)
-        self.small_font = pygame.font.Font(None, 24)
-        self.player = Player(400, 300)
+        self.font = assets.font(None, 36, owner=self.name)
+        self.small_font = assets.font(None, 24, owner=self.name)
+        
+        progress = saves.get("game") if self.load_saved else None
+        self.load_saved = False
+        
+        # The seabed streams in around the camera as the player swims
+        self.world = ChunkedWorld(seed=0, scale=self.render_scale())
+        width, height = self.world.size
+        
+        # Every creature, the player included, is a row in the entity store
+        self.entities = EntityStore(self.world.size, capacity=self.creature_count + 1)
+        start = (progress["x"], progress["y"]) if progress else (width / 2, height / 2)
+        self.player = self.entities.spawn(*start, 30, 200, color=(100, 150, 255),
+                                          kind=PLAYER_KIND, handle_class=Player)
+        self.camera = Camera(VIEW_SIZE, self.world.size)
+        self.camera.jump(*start)
+        self.world.load_now(self.camera.view_rect())
+        self.particles = ParticleSystem(self.emitters)
+        self.particle_time = None
+        rng = self.entities.rng
+        species = self.species
+        left = max(0, min(width - SPAWN_AREA[0], start[0] - SPAWN_AREA[0] / 2))
+        top = max(0, min(height - SPAWN_AREA[1], start[1] - SPAWN_AREA[1] / 2))
+        for _ in range(self.creature_count):
+            creature = species[rng.integers(len(species))]
+            x = left + rng.uniform(0, SPAWN_AREA[0])
+            y = top + rng.uniform(0, SPAWN_AREA[1])
+            self.entities.spawn(x, y, creature["size"], creature["speed"],
+                                state=WANDER, color=creature["color"], kind=creature["kind"])
+        self.spatial = SpatialHash(GRID_SIZE)
+        self.spatial.sync(self.entities)
+        self.nearby = []
+        self.population = Population(NPC_COUNT, self.world.size, seed=0, event_kinds=len(self.npc_events))
+        self.skip_news = None
+        self.skip_time_left = None
+
         self.score = 0
-        self.game_time = 0
-        self.paused = False
+        self.age = 16
+        self.high_tide = False
+        self.event_message = None
+        self.rng = random.Random(0)
+        self.drawn_player_rect = None
         
-    def update(self, dt):
-        if not self.paused:
-            self.game_time += dt
-            
-            # Get current key states
-            keys = pygame.key.get_pressed()
-            self.player.update(dt, keys)
+        # Timed events; the game clock restarts from zero, or from where
+        # saved progress left off (timers are due relative to it)
+        scheduler = self.state_manager.scheduler
+        scheduler.clear(self.name)
+        if progress:
+            self.score = progress["score"]
+            self.age = progress["age"]
+            self.high_tide = progress["high_tide"]
+            scheduler.timeline(self.name).time = progress["time"]
+        scheduler.every(0.1, self.add_score, owner=self.name)
+        scheduler.every(YEAR_LENGTH, self.grow_older, owner=self.name)
+        scheduler.every(TIDE_LENGTH, self.turn_tide, owner=self.name)
+        scheduler.every(AUTOSAVE_INTERVAL, self.autosave, owner=self.name)
+        self.schedule_life_event()
+        
+    def exit(self):
+        self.autosave()
+        self.world.close()
+        self.population.close()
+        
+    def suspend(self):
+        # The game clock only runs while the game is current, so timed
+        # events wait until it resumes
+        self.autosave()
+        
+    def resume(self):
+        # Particles don't jump ahead by the time spent in an overlay
+        self.particle_time = None
+        
+    def autosave(self):
+        """Queue the current progress for the background save writer"""
+        saves.put("game", {
+            "score": self.score,
+            "time": self.game_time,
+            "age": self.age,
+            "high_tide": self.high_tide,
+            "x": self.player.x,
+            "y": self.player.y
+        })
+        
+    @property
+    def game_time(self):
+        """Seconds of unpaused play since entering the game"""
+        return self.state_manager.scheduler.time(self.name)
+        
+    def add_score(self):
+        # Simple scoring system (time-based)
+        self.score += 1
+        
+    def grow_older(self):
+        self.age += 1
+        
+    def turn_tide(self):
+        self.high_tide = not self.high_tide
+        
+    def schedule_life_event(self):
+        """Queue the next life-changing event at a random time"""
+        delay = self.rng.uniform(*EVENT_DELAY)
+        self.state_manager.scheduler.schedule(delay, self.life_event, owner=self.name)
+        
+    def life_event(self):
+        self.event_message = self.rng.choice(self.life_events)["text"]
+        self.mark_dirty()
+        self.state_manager.scheduler.schedule(EVENT_DISPLAY_TIME, self.clear_life_event, owner=self.name)
+        self.schedule_life_event()
+        
+    def clear_life_event(self):
+        self.event_message = None
+        self.mark_dirty()
+        
+    def start_time_skip(self):
+        """Let a year pass for the mermaids of the reef, on worker processes"""
+        if self.skip_time_left is not None or not self.population.start_skip(DAYS_PER_YEAR):
+            return
+        self.skip_news = None
+        if self.state_manager.input:
+            # Recorded and replayed sessions end the skip after a set time
+            # rather than when the workers happen to finish
+            self.skip_time_left = RECORDED_SKIP_TIME
+        
+    def poll_time_skip(self):
+        """Show the latest news from the running time skip, and end it once done"""
+        events = self.population.poll()
+        news = events[events["event"] != DIED]
+        if len(news):
+            last = news[-1]
+            self.skip_news = self.npc_events[last["event"]]["text"].format(name=npc_name(int(last["npc"])))
+        if self.skip_time_left is None:
+            if not self.population.running:
+                self.finish_time_skip()
+        elif self.skip_time_left <= 0:
+            # Waits only if the workers are still busy at the set time
+            self.finish_time_skip()
             
-            # Simple scoring system (time-based)
-            self.score = int(self.game_time * 10)
+    def finish_time_skip(self):
+        events = self.population.finish()
+        deaths = int((events["event"] == DIED).sum())
+        self.age += 1
+        self.skip_news = None
+        self.skip_time_left = None
+        self.event_message = f"A year passes: {len(events) - deaths} tales, {deaths} farewells"
+        self.mark_dirty()
+        self.state_manager.scheduler.schedule(EVENT_DISPLAY_TIME, self.clear_life_event, owner=self.name)
+        
+    def update(self, dt):
+        # Keys held this tick (recorded or replayed if an input source is set)
+        keys = self.state_manager.keys
+        old_rect = self.player.get_rect()
+        self.player.update(dt, keys)
+        self.entities.update(dt)
+        self.spatial.sync(self.entities)
+        new_rect = self.player.get_rect()
+        if self.camera.follow(self.player.x, self.player.y):
+            # The whole view scrolls
+            self.mark_dirty()
+        elif new_rect != old_rect:
+            # The player is drawn somewhere between the two positions
+            offset = self.camera.offset()
+            self.mark_dirty(old_rect.union(new_rect).move(-offset[0], -offset[1]))
+            if self.drawn_player_rect:
+                self.mark_dirty(self.drawn_player_rect)
+        
+        if self.skip_time_left is not None:
+            self.skip_time_left -= dt
+        if self.population.running or self.skip_time_left is not None:
+            self.poll_time_skip()
+        
+        # Creatures close enough to interact with
+        nearby = self.spatial.query_radius(self.entities, self.player.x, self.player.y, NEARBY_RADIUS)
+        self.nearby = nearby[nearby != self.player.index]
+        
+        self.mark_dirty(self.hud_rect)
+        
+        # Creatures move all over the screen
+        if self.creature_count:
+            self.mark_dirty()
+        
+    def checksum(self):
+        n = self.entities.count
+        crc = zlib.crc32(self.entities.positions[:n].tobytes())
+        crc = zlib.crc32(self.entities.velocities[:n].tobytes(), crc)
+        progress = (self.score, self.age, self.high_tide, self.game_time, self.event_message)
+        return zlib.crc32(repr(progress).encode(), crc)
+        
+    def render_scale(self):
+        display = self.state_manager.display
+        return display.render_scale if display else 1.0
+        
+    def make_creature_sprite(self, size, color):
+        """Pre-rendered sprite for a creature kind"""
+        size = max(1, size)
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, color, (size // 2, size // 2), size // 2)
+        return sprite
+        
+    def draw_creatures(self, queue, alpha, view):
+        """Queue every creature, then the player on top, as entity sprites
+
+        The render queue skips the ones off screen. They are drawn at full
+        resolution, over the world even when it is rendered smaller and
+        scaled up.
+        """
+        if not self.creature_sprites:
+            self.creature_sprites = {creature["kind"]: self.make_creature_sprite(creature["size"], creature["color"])
+                                     for creature in self.species}
+            self.creature_sprites[PLAYER_KIND] = self.player.make_sprite()
+        store = self.entities
+        indices = store.live_indices()
+        indices = indices[store.kinds[indices] != PLAYER_KIND]
+        sizes = store.sizes[indices]
+        positions = store.interpolated_positions(indices, alpha)
+        positions -= (sizes // 2)[:, None]
+        positions -= view.topleft
+        sprites = self.creature_sprites
+        for kind, pos in zip(store.kinds[indices].tolist(), positions.astype(int).tolist()):
+            queue.blit(sprites[kind], pos, layer=LAYER_ENTITIES)
+        player_sprite = sprites[PLAYER_KIND]
+        x, y = self.player.get_position(alpha)
+        queue.blit(player_sprite, player_sprite.get_rect(center=(round(x - view.x), round(y - view.y))),
+                   layer=LAYER_ENTITIES, z=1)
+        self.drawn_player_rect = self.player.get_rect(alpha).move(-view.x, -view.y)
         
     def draw(self, screen):
-        # Background
-        screen.fill((20, 40, 20))
-        
-        # Draw a simple grid pattern
-        grid_size = 50
-        for x in range(0, 800, grid_size):
-            pygame.draw.line(screen, (0, 60, 0), (x, 0), (x, 600))
-        for y in range(0, 600, grid_size):
-            pygame.draw.line(screen, (0, 60, 0), (0, y), (800, y))
-            
-        # Draw player
-        self.player.draw(screen)
+        queue = self.state_manager.render_queue
+        alpha = self.state_manager.interpolation
+        view = self.camera.view_rect(alpha)
+        # The seabed and particles are drawn in a few batches of their own, so they are queued whole
+        queue.draw(lambda screen: self.draw_world(screen, view), layer=LAYER_WORLD)
+        self.draw_creatures(queue, alpha, view)
+        
+        # HUD - Score, time, nearby creatures and life
+        white = (255, 255, 255)
+        grey = (200, 200, 200)
+        tide = "High" if self.high_tide else "Low"
+        queue.text(self.font, f"Score: {self.score}", white, topleft=(10, 10))
+        queue.text(self.font, f"Time: {self.game_time:.1f}s", white, topleft=(10, 50))
+        queue.text(self.small_font, f"Nearby: {len(self.nearby)}", grey, topleft=(10, 90))
+        queue.text(self.small_font, f"Age: {self.age}  Tide: {tide}", grey, topleft=(10, 110))
         
-        # HUD - Score
-        score_text = self.font.render(f"Score: {self.score}", True, (255, 255, 255))
-        screen.blit(score_text, (10, 10))
+        # Life-changing event
+        if self.event_message:
+            queue.text(self.font, self.event_message, (255, 230, 150), layer=LAYER_OVERLAY, center=(400, 200))
         
-        # HUD - Time
-        time_text = self.font.render(f"Time: {self.game_time:.1f}s", True, (255, 255, 255))
-        screen.blit(time_text, (10, 50))
+        # Time skip progress
+        if self.population.running or self.skip_time_left is not None:
+            queue.text(self.font, f"A year passes... {self.population.progress * 100:.0f}%", white,
+                       layer=LAYER_OVERLAY, center=(400, 250))
+            if self.skip_news:
+                queue.text(self.small_font, self.skip_news, grey, layer=LAYER_OVERLAY, center=(400, 285))
         
         # HUD - Controls
         controls = [
             "WASD/Arrow Keys: Move",
+            "Y: Let a year pass",
             "ESC: Options",
             "P: Pause"
         ]
         for i, control in enumerate(controls):
-            control_text = self.small_font.render(control, True, (200, 200, 200))
-            screen.blit(control_text, (10, 550 + i * 20))
-            
-        # Pause overlay
-        if self.paused:
-            overlay = pygame.Surface((800, 600))
-            overlay.fill((0, 0, 0))
-            overlay.set_alpha(128)
-            screen.blit(overlay, (0, 0))
-            
-            pause_text = self.font.render("PAUSED", True, (255, 255, 255))
-            pause_rect = pause_text.get_rect(center=(400, 280))
-            screen.blit(pause_text, pause_rect)
-            
-            resume_text = self.small_font.render("Press P to resume", True, (200, 200, 200))
-            resume_rect = resume_text.get_rect(center=(400, 320))
-            screen.blit(resume_text, resume_rect)
+            queue.text(self.small_font, control, grey, topleft=(10, 520 + i * 20))
+        
+    def draw_world(self, screen, view):
+        # Seabed chunks in view; streaming happens here so that simulating
+        # without drawing never generates any
+        # Below full resolution the world is drawn smaller, then scaled up
+        # under the HUD, which stays sharp
+        scale = self.render_scale()
+        target = screen
+        if scale != 1.0:
+            size = (round(VIEW_SIZE[0] * scale), round(VIEW_SIZE[1] * scale))
+            if self.world_surface is None or self.world_surface.get_size() != size:
+                self.world_surface = pygame.Surface(size)
+                if pygame.display.get_surface() is not None:
+                    self.world_surface = self.world_surface.convert()
+            target = self.world_surface
+        self.world.set_scale(scale)
+        self.world.stream(view)
+        self.world.draw(target, view)
+        
+        # Particles move by real time between frames, as they are only drawn
+        now = time.perf_counter()
+        if self.particle_time is not None:
+            self.particles.update(now - self.particle_time, view)
+        self.particle_time = now
+        self.particles.draw(target, view, scale)
+        if target is not screen:
+            pygame.transform.scale(target, VIEW_SIZE, screen)
         
     def handle_event(self, event):
         if event.type == pygame.KEYDOWN:
+            # Overlays keep the game suspended underneath
             if event.key == pygame.K_ESCAPE:
-                self.state_manager.change_state("options")
+                self.state_manager.push_state("options")
             elif event.key == pygame.K_p:
-                self.paused = not self.paused
\ No newline at end of file
+                self.state_manager.push_state("pause")
+            elif event.key == pygame.K_y:
+                self.start_time_skip()
\ No newline at end of file
@@ -0,0 +1,44 @@
+import pygame
+from state_manager import BaseState
+from assets import assets
+from render_queue import LAYER_BACKGROUND, LAYER_OVERLAY
+
+class PauseState(BaseState):
+    """Pushed over the game while it is paused"""
+    manifest = (
+        ("font", None, 36),
+        ("font", None, 24)
+    )
+    # Menus only change on input, at most 30 times a second
+    animating = False
+    frame_rate = 30
+
+    def __init__(self):
+        super().__init__()
+        self.font = None
+        self.small_font = None
+
+    def enter(self):
+        self.font = assets.font(None, 36, owner=self.name)
+        self.small_font = assets.font(None, 24, owner=self.name)
+
+        # Darken the frozen game frame once rather than blending every frame
+        if self.frozen_frame:
+            self.frozen_frame.fill((128, 128, 128), special_flags=pygame.BLEND_MULT)
+
+    def draw(self, screen):
+        queue = self.state_manager.render_queue
+        if self.frozen_frame:
+            queue.blit(self.frozen_frame, (0, 0), layer=LAYER_BACKGROUND)
+        else:
+            queue.fill((0, 0, 0))
+
+        queue.text(self.font, "PAUSED", (255, 255, 255), layer=LAYER_OVERLAY, center=(400, 280))
+        queue.text(self.small_font, "Press P to resume", (200, 200, 200), layer=LAYER_OVERLAY, center=(400, 320))
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_p:
+                self.state_manager.pop_state()
+            elif event.key == pygame.K_ESCAPE:
+                self.state_manager.push_state("options")
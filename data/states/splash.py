@@ -1,55 +1,140 @@
 import pygame
 from state_manager import BaseState
+from text_cache import text_cache
+from assets import assets
+from loader import Loader
+from render_queue import LAYER_UI
 
 class SplashState(BaseState):
+    manifest = (
+        ("font", None, 72),
+    )
+    # States whose assets and data are loaded while the splash is shown
+    preload_states = ("title", "character", "game", "options", "pause")
+    
     def __init__(self):
         super().__init__()
         self.font = None
         self.fade_timer = 0
         self.fade_duration = 2.0  # 2 seconds fade in/out
-        self.display_duration = 1.0  # 1 second at full opacity
-        self.total_duration = self.fade_duration * 2 + self.display_duration
+        self.display_duration = 1.0  # at least 1 second at full opacity
         self.alpha = 0
+        # Faded copy of the title text
+        self.text = None
+        self.text_rect = None
+        self.loader = None
+        self.progress = 0.0
+        self.fade_out_start = None
+        self.skip_requested = False
+        self.min_display_done = False
+        self.bar_rect = pygame.Rect(250, 370, 300, 8)
         
     def enter(self):
-        """Initialize splash screen elements"""
-        self.font = pygame.font.Font(None, 72)
+        """Initialize splash screen elements and start loading"""
+        self.font = assets.font(None, 72, owner=self.name)
+        self.text = None
         self.fade_timer = 0
+        self.alpha = 0
+        self.progress = 0.0
+        self.fade_out_start = None
+        self.skip_requested = False
+        self.min_display_done = False
+        self.state_manager.scheduler.schedule(self.fade_duration + self.display_duration,
+                                              setattr, self, 'min_display_done', True, owner=self.name)
+        
+        self.loader = Loader()
+        for name in self.preload_states:
+            if name in self.state_manager.states:
+                self.preload(name, self.state_manager.states[name])
+            elif self.state_manager.has_state(name):
+                # Import and build the state off the main thread too
+                self.loader.submit(self.state_manager.build_state, name,
+                                   callback=lambda state, name=name: self.on_state_built(name, state))
+        
+    def exit(self):
+        """Stop any loading still in progress"""
+        self.loader.shutdown()
+        
+    def on_state_built(self, name, state):
+        """Register a state built on a loader thread and queue its loading"""
+        if name not in self.state_manager.states:
+            self.state_manager.register(name, state)
+        self.preload(name, self.state_manager.states[name])
+        
+    def preload(self, name, state):
+        """Queue a state's assets and data on the loader"""
+        self.loader.load_manifest(name, state.manifest)
+        if not state.data_loaded:
+            self.loader.submit(state.load_data,
+                               callback=lambda result, state=state: setattr(state, 'data_loaded', True))
         
     def update(self, dt):
-        """Handle fade in/out timing"""
+        """Track loading and handle fade in/out timing"""
         self.fade_timer += dt
         
+        previous_alpha = self.alpha
+        previous_progress = self.progress
+        self.progress = self.loader.poll()
+        loaded = self.loader.is_done()
+        
+        # Leave once loading is done and the splash has been up long enough
+        if self.fade_out_start is None and loaded:
+            if self.skip_requested:
+                self.state_manager.change_state("title")
+            elif self.min_display_done:
+                self.fade_out_start = self.fade_timer
+                
         # Calculate alpha based on timer
-        if self.fade_timer < self.fade_duration:
+        if self.fade_out_start is not None:
+            # Fade out
+            fade_out_progress = (self.fade_timer - self.fade_out_start) / self.fade_duration
+            if fade_out_progress >= 1:
+                # Done, go to title screen
+                self.alpha = 0
+                self.state_manager.change_state("title")
+            else:
+                self.alpha = int(255 * (1 - fade_out_progress))
+        elif self.fade_timer < self.fade_duration:
             # Fade in
             self.alpha = int(255 * (self.fade_timer / self.fade_duration))
-        elif self.fade_timer < self.fade_duration + self.display_duration:
-            # Full opacity
-            self.alpha = 255
-        elif self.fade_timer < self.total_duration:
-            # Fade out
-            fade_out_progress = (self.fade_timer - self.fade_duration - self.display_duration) / self.fade_duration
-            self.alpha = int(255 * (1 - fade_out_progress))
         else:
-            # Done, go to title screen
-            self.state_manager.change_state("title")
+            # Full opacity until loading is done
+            self.alpha = 255
+            
+        # Only the title text and progress bar change
+        if self.alpha != previous_alpha:
+            self.mark_dirty(self.text_rect)
+        if self.progress != previous_progress:
+            self.mark_dirty(self.bar_rect)
             
     def draw(self, screen):
         """Draw splash screen"""
-        screen.fill((0, 0, 0))
+        queue = self.state_manager.render_queue
+        queue.fill((0, 0, 0))
         
-        # Create text surface
-        text = self.font.render("Your Game Studio", True, (255, 255, 255))
+        # Faded on a copy, as the cached surface is shared with other callers
+        if self.text is None:
+            self.text = text_cache.render(self.font, "Your Game Studio", True, (255, 255, 255)).copy()
+        text = self.text
         text.set_alpha(self.alpha)
         
         # Center text
         text_rect = text.get_rect()
         text_rect.center = (screen.get_width() // 2, screen.get_height() // 2)
+        self.text_rect = text_rect
         
-        screen.blit(text, text_rect)
+        queue.blit(text, text_rect)
         
+        # Loading progress bar, hidden once loading is done
+        if not self.loader.is_done():
+            self.bar_rect.centerx = screen.get_width() // 2
+            self.bar_rect.top = text_rect.bottom + 30
+            fill = self.bar_rect.copy()
+            fill.width = int(self.bar_rect.width * self.progress)
+            queue.rect((100, 150, 255), fill, layer=LAYER_UI)
+            queue.rect((120, 120, 120), self.bar_rect, 1, layer=LAYER_UI)
+            
     def handle_event(self, event):
-        """Allow skipping splash with any key/click"""
+        """Allow skipping splash with any key/click once loading is done"""
         if event.type in [pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN]:
-            self.state_manager.change_state("title")
\ No newline at end of file
+            self.skip_requested = True
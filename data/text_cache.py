@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+class TextCache:
+    """LRU cache of rendered text surfaces shared by all states"""
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):
+        """Return a surface for text, rasterizing it only on a cache miss
+
+        The returned surface is shared, so callers should not draw on it.
+        """
+        key = (font, text, antialias, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+
+        # Evict least recently used entries
+        while len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def discard_font(self, font):
+        """Drop every surface rendered with a font"""
+        for key in [key for key in self.surfaces if key[0] is font]:
+            del self.surfaces[key]
+
+    def clear(self):
+        """Drop every cached surface"""
+        self.surfaces.clear()
+
+    def reset_stats(self):
+        """Reset hit/miss counters"""
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return cache statistics as a dict"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self.surfaces),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+# Shared instance used by every state
+text_cache = TextCache()
@@ -0,0 +1,115 @@
+from bisect import bisect_right
+from collections import OrderedDict
+
+class Layout:
+    """Text word-wrapped to a width: its lines, their widths and where each starts
+
+    starts[i] is the number of characters in the lines before line i,
+    which is what a typewriter reveal counts in.
+    """
+    __slots__ = ("lines", "widths", "starts", "line_height", "char_count")
+
+    def __init__(self, lines, widths, line_height):
+        self.lines = lines
+        self.widths = widths
+        self.line_height = line_height
+        self.starts = []
+        count = 0
+        for line in lines:
+            self.starts.append(count)
+            count += len(line)
+        self.char_count = count
+
+    @property
+    def height(self):
+        return len(self.lines) * self.line_height
+
+    def line_at(self, chars):
+        """Index of the line the chars-th revealed character falls in"""
+        return max(0, bisect_right(self.starts, chars) - 1)
+
+def split_word(word, font, width):
+    """Break a word too long for one line into pieces that fit"""
+    pieces = []
+    while len(word) > 1 and font.size(word)[0] > width:
+        cut = len(word) - 1
+        while cut > 1 and font.size(word[:cut])[0] > width:
+            cut -= 1
+        pieces.append(word[:cut])
+        word = word[cut:]
+    pieces.append(word)
+    return pieces
+
+def wrap_text(text, font, width):
+    """Split text into lines no wider than width, breaking at spaces
+
+    Newlines start a new paragraph. Words are measured once each and
+    breaks chosen from their summed widths, rather than measuring every
+    candidate line; each finished line is measured once for its width.
+    Returns (lines, line widths).
+    """
+    lines = []
+    widths = []
+    space = font.size(" ")[0]
+    for paragraph in text.split("\n"):
+        line = []
+        line_width = 0
+        for word in paragraph.split():
+            for piece in split_word(word, font, width):
+                piece_width = font.size(piece)[0]
+                if line and line_width + space + piece_width > width:
+                    lines.append(" ".join(line))
+                    widths.append(font.size(lines[-1])[0])
+                    line = []
+                    line_width = 0
+                line_width += piece_width + (space if line else 0)
+                line.append(piece)
+        lines.append(" ".join(line))
+        widths.append(font.size(lines[-1])[0])
+    return lines, widths
+
+class LayoutCache:
+    """LRU cache of text layouts, keyed by (text, font, width)"""
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.layouts = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def layout(self, text, font, width):
+        """Return the layout of text wrapped to width, wrapping it only on a cache miss"""
+        key = (text, font, width)
+        layout = self.layouts.get(key)
+        if layout is not None:
+            self.hits += 1
+            self.layouts.move_to_end(key)
+            return layout
+
+        self.misses += 1
+        layout = Layout(*wrap_text(text, font, width), font.get_linesize())
+        self.layouts[key] = layout
+        while len(self.layouts) > self.max_size:
+            self.layouts.popitem(last=False)
+        return layout
+
+    def discard_font(self, font):
+        """Drop every layout made with a font"""
+        for key in [key for key in self.layouts if key[1] is font]:
+            del self.layouts[key]
+
+    def clear(self):
+        self.layouts.clear()
+
+    def stats(self):
+        """Return cache statistics as a dict"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self.layouts),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+# Shared instance used by every state
+layouts = LayoutCache()
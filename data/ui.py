@@ -0,0 +1,425 @@
+import pygame
+from collections import OrderedDict
+from text_cache import text_cache
+from text_layout import layouts
+from render_queue import LAYER_UI
+
+# Size of the hit-test grid cells, in pixels
+HIT_CELL_SIZE = 100
+# Rendered pages a TextBox keeps; pages scrolled away from are rendered again
+MAX_TEXT_PAGES = 3
+
+def coalesce_motion(events):
+    """Merge runs of consecutive MOUSEMOTION events into one
+
+    The merged event has the last position and buttons and the summed
+    relative motion, so handlers see the same end result with less work.
+    """
+    merged = []
+    for event in events:
+        if event.type == pygame.MOUSEMOTION and merged and merged[-1].type == pygame.MOUSEMOTION:
+            previous = merged[-1]
+            rel = (previous.rel[0] + event.rel[0], previous.rel[1] + event.rel[1])
+            merged[-1] = pygame.event.Event(pygame.MOUSEMOTION, {**event.dict, 'rel': rel})
+        else:
+            merged.append(event)
+    return merged
+
+def display_format(surface):
+    """Convert a surface to the display format, if there is a display"""
+    if pygame.display.get_surface() is not None:
+        return surface.convert()
+    return surface
+
+class Widget:
+    """Base class for retained-mode widgets
+
+    Widgets keep their look in pre-rendered surfaces and only build them
+    again when something they show changes; invalidate() then reports
+    the widget's bounds to its group for redrawing.
+    """
+    # Event types, besides mouse and wheel events, the widget wants to receive
+    events = ()
+
+    def __init__(self, rect):
+        self.rect = pygame.Rect(rect)
+        self.hovered = False
+        self.group = None
+
+    def get_bounds(self):
+        """Screen area the widget draws to and responds to clicks in"""
+        return self.rect
+
+    def invalidate(self):
+        """Ask for the widget to be redrawn"""
+        if self.group:
+            self.group.mark_dirty(self.get_bounds())
+
+    def set_hovered(self, hovered):
+        if hovered != self.hovered:
+            self.hovered = hovered
+            self.invalidate()
+
+    def release(self):
+        """Forget a press or drag in progress, whose button-up may never arrive"""
+        pass
+
+    def handle_event(self, event):
+        """Respond to an event routed to this widget; return True if it was used"""
+        return False
+
+    def draw(self, queue, layer=LAYER_UI):
+        """Submit the widget's pre-rendered surfaces to a RenderQueue"""
+        pass
+
+class Button(Widget):
+    """A clickable box with centred text; calls on_click when pressed"""
+    def __init__(self, x, y, width, height, text, font, on_click=None):
+        super().__init__((x, y, width, height))
+        self._text = text
+        self.font = font
+        self.on_click = on_click
+        # Pre-rendered look for each hover state
+        self.surfaces = {}
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        if text != self._text:
+            self._text = text
+            self.surfaces.clear()
+            self.invalidate()
+
+    def render(self, hovered):
+        surface = pygame.Surface(self.rect.size)
+        surface.fill((100, 100, 100) if hovered else (70, 70, 70))
+        pygame.draw.rect(surface, (200, 200, 200), surface.get_rect(), 2)
+        text_surface = text_cache.render(self.font, self._text, True, (255, 255, 255))
+        surface.blit(text_surface, text_surface.get_rect(center=surface.get_rect().center))
+        return display_format(surface)
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.rect.collidepoint(event.pos):
+            if self.on_click:
+                self.on_click()
+            return True
+        return False
+
+    def draw(self, queue, layer=LAYER_UI):
+        surface = self.surfaces.get(self.hovered)
+        if surface is None:
+            surface = self.surfaces[self.hovered] = self.render(self.hovered)
+        queue.blit(surface, self.rect, layer=layer)
+
+class Slider(Widget):
+    """A draggable value between min_val and max_val; calls on_change while dragged"""
+    def __init__(self, x, y, width, min_val, max_val, initial_val, label, font, on_change=None):
+        super().__init__((x, y, width, 20))
+        self.min_val = min_val
+        self.max_val = max_val
+        self.val = initial_val
+        self.label = label
+        self.font = font
+        self.on_change = on_change
+        self.dragging = False
+        self.label_rect = pygame.Rect(x, y - 25, width, 25)
+        self.handle_x = self.position_of(initial_val)
+        self.track = None
+        self.handle_surface = None
+
+    def position_of(self, val):
+        return self.rect.x + int((val - self.min_val) / (self.max_val - self.min_val) * self.rect.width)
+
+    def handle_rect(self):
+        return pygame.Rect(self.handle_x - 10, self.rect.y - 5, 20, 30)
+
+    def set_hovered(self, hovered):
+        # Looks the same either way, so there is nothing to redraw
+        self.hovered = hovered
+
+    def release(self):
+        self.dragging = False
+
+    def get_bounds(self):
+        # Leave room for the value text to grow by a digit
+        return self.rect.inflate(22, 12).union(self.label_rect.inflate(40, 0))
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if event.button == 1 and self.handle_rect().collidepoint(event.pos):
+                self.dragging = True
+                return True
+        elif event.type == pygame.MOUSEBUTTONUP:
+            if event.button == 1 and self.dragging:
+                self.dragging = False
+                return True
+        elif event.type == pygame.MOUSEMOTION and self.dragging:
+            relative_x = max(0, min(self.rect.width, event.pos[0] - self.rect.x))
+            val = self.min_val + relative_x / self.rect.width * (self.max_val - self.min_val)
+            if val != self.val:
+                self.val = val
+                self.handle_x = self.rect.x + relative_x
+                self.invalidate()
+                if self.on_change:
+                    self.on_change(val)
+            return True
+        return False
+
+    def render(self):
+        self.track = pygame.Surface(self.rect.size)
+        self.track.fill((100, 100, 100))
+        pygame.draw.rect(self.track, (200, 200, 200), self.track.get_rect(), 2)
+        self.track = display_format(self.track)
+        self.handle_surface = pygame.Surface((20, 30))
+        self.handle_surface.fill((150, 150, 150))
+        pygame.draw.rect(self.handle_surface, (255, 255, 255), self.handle_surface.get_rect(), 2)
+        self.handle_surface = display_format(self.handle_surface)
+
+    def draw(self, queue, layer=LAYER_UI):
+        if self.track is None:
+            self.render()
+        self.label_rect = queue.text(self.font, f"{self.label}: {self.val:.1f}", (255, 255, 255), layer=layer,
+                                     topleft=(self.rect.x, self.rect.y - 25))
+        queue.blit(self.track, self.rect, layer=layer)
+        queue.blit(self.handle_surface, self.handle_rect(), layer=layer)
+
+class TextBox(Widget):
+    """Word-wrapped text that scrolls, pages and can type itself out
+
+    The layout comes from the shared layout cache and each page of lines
+    is rendered once, so revealing text only changes how much of the
+    rendered lines is blitted. With chars_per_second set, set_text()
+    reveals the visible page a character at a time; next_page() finishes
+    the page first, then turns it.
+    """
+    def __init__(self, rect, font, color=(255, 255, 255), align="left", chars_per_second=None):
+        super().__init__(rect)
+        self.font = font
+        self.color = color
+        self.align = align
+        self.chars_per_second = chars_per_second
+        self.text = None
+        self.layout = layouts.layout("", font, self.rect.width)
+        # Index of the first visible line
+        self.top = 0
+        self.revealed = 0.0
+        # Page index -> rendered lines of that page, least recently drawn first
+        self.pages = OrderedDict()
+
+    @property
+    def lines_per_page(self):
+        return max(1, self.rect.height // self.layout.line_height)
+
+    @property
+    def view_end(self):
+        """Characters up to the end of the last visible line"""
+        end = self.top + self.lines_per_page
+        if end >= len(self.layout.lines):
+            return self.layout.char_count
+        return self.layout.starts[end]
+
+    @property
+    def revealing(self):
+        return self.revealed < self.view_end
+
+    def set_hovered(self, hovered):
+        # Text looks the same either way
+        self.hovered = hovered
+
+    def set_text(self, text):
+        if text == self.text:
+            return
+        self.text = text
+        self.layout = layouts.layout(text, self.font, self.rect.width)
+        self.pages.clear()
+        self.top = 0
+        self.revealed = 0.0 if self.chars_per_second else self.layout.char_count
+        self.invalidate()
+
+    def skip_reveal(self):
+        if self.revealing:
+            self.revealed = self.view_end
+            self.invalidate()
+
+    def scroll(self, lines):
+        """Move the view by a number of lines; return True if it moved"""
+        last_top = max(0, len(self.layout.lines) - self.lines_per_page)
+        top = max(0, min(last_top, self.top + lines))
+        if top == self.top:
+            return False
+        self.top = top
+        # Lines scrolled past count as read
+        self.revealed = max(self.revealed, self.layout.starts[top])
+        self.invalidate()
+        return True
+
+    def next_page(self):
+        """Finish revealing the page, or turn to the next; return False at the end"""
+        if self.revealing:
+            self.skip_reveal()
+            return True
+        return self.scroll(self.lines_per_page)
+
+    def prev_page(self):
+        return self.scroll(-self.lines_per_page)
+
+    def update(self, dt):
+        if not self.revealing:
+            return
+        before = int(self.revealed)
+        self.revealed = min(self.revealed + self.chars_per_second * dt, self.view_end)
+        after = int(self.revealed)
+        if after != before and self.group:
+            # Only the lines the new characters landed on change
+            height = self.layout.line_height
+            first = self.layout.line_at(before)
+            last = self.layout.line_at(after)
+            top = self.rect.y + (first - self.top) * height
+            self.group.mark_dirty(pygame.Rect(self.rect.x, top, self.rect.width, (last - first + 1) * height))
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEWHEEL:
+            return self.scroll(-event.y)
+        return False
+
+    def line_x(self, index):
+        if self.align == "center":
+            return max(0, (self.rect.width - self.layout.widths[index]) // 2)
+        return 0
+
+    def page_surface(self, page):
+        surface = self.pages.get(page)
+        if surface is not None:
+            self.pages.move_to_end(page)
+            return surface
+
+        count = self.lines_per_page
+        height = self.layout.line_height
+        surface = pygame.Surface((self.rect.width, count * height), pygame.SRCALPHA)
+        first = page * count
+        for row, line in enumerate(self.layout.lines[first:first + count]):
+            if line:
+                surface.blit(self.font.render(line, True, self.color), (self.line_x(first + row), row * height))
+        self.pages[page] = surface
+        while len(self.pages) > MAX_TEXT_PAGES:
+            self.pages.popitem(last=False)
+        return surface
+
+    def draw(self, queue, layer=LAYER_UI):
+        layout = self.layout
+        height = layout.line_height
+        count = self.lines_per_page
+        revealed = int(self.revealed)
+        for row in range(count):
+            index = self.top + row
+            if index >= len(layout.lines) or layout.starts[index] >= revealed and layout.lines[index]:
+                break
+            page, offset = divmod(index, count)
+            line = layout.lines[index]
+            x = self.line_x(index)
+            shown = revealed - layout.starts[index]
+            width = layout.widths[index] if shown >= len(line) else self.font.size(line[:shown])[0]
+            area = pygame.Rect(x, offset * height, width, height)
+            queue.blit(self.page_surface(page), (self.rect.x + x, self.rect.y + row * height), area, layer=layer)
+
+class WidgetGroup:
+    """The widgets of one screen, with event routing and a hit-test index
+
+    Mouse events go only to the widget under the pointer (or the one
+    holding the mouse while dragging), found through a grid of screen
+    cells. Wheel events carry no position, so they go to the widget the
+    last mouse motion hovered; other events go only to widgets that
+    listed their type.
+    Invalidated widget bounds are passed to mark_dirty, usually the
+    owning state's.
+    """
+    def __init__(self, mark_dirty=None, cell_size=HIT_CELL_SIZE):
+        self.widgets = []
+        self.mark_dirty = mark_dirty or (lambda rect: None)
+        self.cell_size = cell_size
+        # (cx, cy) -> widgets overlapping that cell, topmost last
+        self.cells = {}
+        # Event type -> widgets that want it
+        self.handlers = {}
+        self.hovered = None
+        # Widget that gets every mouse event until the button is released
+        self.captured = None
+
+    def add(self, widget):
+        widget.group = self
+        self.widgets.append(widget)
+        bounds = widget.get_bounds()
+        size = self.cell_size
+        for cx in range(bounds.left // size, (bounds.right - 1) // size + 1):
+            for cy in range(bounds.top // size, (bounds.bottom - 1) // size + 1):
+                self.cells.setdefault((cx, cy), []).append(widget)
+        for event_type in widget.events:
+            self.handlers.setdefault(event_type, []).append(widget)
+        widget.invalidate()
+        return widget
+
+    def clear(self):
+        for widget in self.widgets:
+            widget.group = None
+        self.widgets = []
+        self.cells = {}
+        self.handlers = {}
+        self.hovered = None
+        self.captured = None
+
+    def release(self):
+        """Drop the hovered and captured widgets, e.g. when another state is pushed
+
+        The pushed state gets the mouse events from then on, so the
+        button-up and motion that would clear them never reach this group.
+        """
+        if self.hovered:
+            self.hovered.set_hovered(False)
+        if self.captured:
+            self.captured.release()
+        self.hovered = None
+        self.captured = None
+
+    def widget_at(self, pos):
+        """Topmost widget whose bounds contain pos, or None"""
+        cell = (pos[0] // self.cell_size, pos[1] // self.cell_size)
+        for widget in reversed(self.cells.get(cell, ())):
+            if widget.get_bounds().collidepoint(pos):
+                return widget
+        return None
+
+    def handle_event(self, event):
+        """Route an event to the widgets it concerns; return True if one used it"""
+        if event.type == pygame.MOUSEMOTION:
+            target = self.widget_at(event.pos)
+            if target is not self.hovered:
+                if self.hovered:
+                    self.hovered.set_hovered(False)
+                if target:
+                    target.set_hovered(True)
+                self.hovered = target
+            widget = self.captured or target
+            return bool(widget and widget.handle_event(event))
+        if event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            widget = self.captured or self.widget_at(event.pos)
+            if not widget:
+                return False
+            used = widget.handle_event(event)
+            if event.type == pygame.MOUSEBUTTONDOWN and used and self.captured is None:
+                self.captured = widget
+            elif event.type == pygame.MOUSEBUTTONUP:
+                self.captured = None
+            return used
+        if event.type == pygame.MOUSEWHEEL:
+            return bool(self.hovered and self.hovered.handle_event(event))
+        used = False
+        for widget in self.handlers.get(event.type, ()):
+            used = widget.handle_event(event) or used
+        return used
+
+    def draw(self, queue, layer=LAYER_UI):
+        for widget in self.widgets:
+            widget.draw(queue, layer)
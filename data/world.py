@@ -0,0 +1,227 @@
+import random
+import pygame
+from collections import OrderedDict
+from loader import Loader
+
+# Side of a square world chunk, in pixels
+CHUNK_SIZE = 256
+# World size in chunks; far too big to keep every chunk in memory
+WORLD_CHUNKS = (128, 128)
+# Bytes of chunk surfaces kept before the least recently seen are evicted
+CHUNK_BUDGET = 32 * 1024 * 1024
+# Chunks beyond the edge of the view that are generated ahead of time
+LOAD_MARGIN = 1
+# Spacing of the seabed grid lines, in pixels
+GRID_SIZE = 50
+# Shown where a chunk is still being generated
+PLACEHOLDER_COLOR = (20, 40, 20)
+
+class Camera:
+    """The part of the world shown on screen
+
+    The camera follows a point once per simulation tick and remembers its
+    previous position, so drawing can interpolate between the two the
+    same way entities are interpolated.
+    """
+    def __init__(self, view_size, world_size):
+        self.view_size = view_size
+        self.world_size = world_size
+        self.x = self.y = 0.0
+        self.prev_x = self.prev_y = 0.0
+
+    def follow(self, x, y):
+        """Centre the view on (x, y), kept inside the world; return True if it moved"""
+        self.prev_x, self.prev_y = self.x, self.y
+        width, height = self.view_size
+        self.x = max(0.0, min(self.world_size[0] - width, x - width / 2))
+        self.y = max(0.0, min(self.world_size[1] - height, y - height / 2))
+        return (self.x, self.y) != (self.prev_x, self.prev_y)
+
+    def jump(self, x, y):
+        """Centre on (x, y) without interpolating from the old position"""
+        self.follow(x, y)
+        self.prev_x, self.prev_y = self.x, self.y
+
+    def offset(self, alpha=1.0):
+        """Top-left world position of the view, interpolated between ticks"""
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
+        return int(x), int(y)
+
+    def view_rect(self, alpha=1.0):
+        return pygame.Rect(self.offset(alpha), self.view_size)
+
+def scaled_chunk_size(scale):
+    return max(1, round(CHUNK_SIZE * scale))
+
+def generate_chunk(seed, coord, scale=1.0):
+    """Draw the seabed of one chunk; a pure function of seed, coord and scale
+
+    Runs on a loader thread, so it only draws into its own new surface.
+    The chunk is drawn at scale times its size in the world.
+    """
+    cx, cy = coord
+    rng = random.Random(seed * 1000003 + cx * 8191 + cy)
+    size = scaled_chunk_size(scale)
+    surface = pygame.Surface((size, size))
+
+    # Water darkens towards the bottom of the world
+    depth = cy / max(1, WORLD_CHUNKS[1] - 1)
+    surface.fill((20, int(40 - 15 * depth), int(20 + 30 * depth)))
+
+    # Grid lines line up across chunk borders
+    left = cx * CHUNK_SIZE
+    top = cy * CHUNK_SIZE
+    for x in range(-left % GRID_SIZE, CHUNK_SIZE, GRID_SIZE):
+        pygame.draw.line(surface, (0, 60, 0), (int(x * scale), 0), (int(x * scale), size))
+    for y in range(-top % GRID_SIZE, CHUNK_SIZE, GRID_SIZE):
+        pygame.draw.line(surface, (0, 60, 0), (0, int(y * scale)), (size, int(y * scale)))
+
+    # Scattered rocks and kelp, from the same random numbers at any scale
+    for _ in range(rng.randint(0, 4)):
+        # Rocks stay inside their chunk, as neighbours don't draw them
+        radius = rng.randint(4, 14)
+        x, y = rng.randrange(radius, CHUNK_SIZE - radius), rng.randrange(radius, CHUNK_SIZE - radius)
+        shade = rng.randint(35, 55)
+        pygame.draw.circle(surface, (shade, shade, shade + 10), (int(x * scale), int(y * scale)),
+                           max(1, round(radius * scale)))
+    for _ in range(rng.randint(0, 3)):
+        x = rng.randrange(CHUNK_SIZE)
+        base = rng.randrange(CHUNK_SIZE // 2, CHUNK_SIZE)
+        tip = (x + rng.randint(-6, 6), base - rng.randint(20, 60))
+        pygame.draw.line(surface, (30, 110, 50), (int(x * scale), int(base * scale)),
+                         (int(tip[0] * scale), int(tip[1] * scale)), max(1, round(3 * scale)))
+    return surface
+
+def chunk_bytes(surface):
+    return surface.get_bytesize() * surface.get_width() * surface.get_height()
+
+class ChunkedWorld:
+    """A large world streamed in fixed-size chunks around the camera
+
+    Chunks near the view are generated on a loader thread and finished
+    on the main thread in stream(). They are kept in an LRU within a
+    byte budget, and chunks around the view are never evicted. Until a
+    chunk is ready its area is drawn in a placeholder colour, so
+    crossing into new chunks never waits for them. Chunks are drawn at
+    the render scale, so a lower scale also fits more in the budget.
+    """
+    def __init__(self, seed=0, budget=CHUNK_BUDGET, workers=2, scale=1.0):
+        self.seed = seed
+        self.scale = scale
+        self.size = (WORLD_CHUNKS[0] * CHUNK_SIZE, WORLD_CHUNKS[1] * CHUNK_SIZE)
+        self.budget = budget
+        self.loader = Loader(workers=workers)
+        # coord -> surface, least recently seen first
+        self.chunks = OrderedDict()
+        self.pending = set()
+        # Coords wanted as of the last stream(); others are dropped when they arrive
+        self.wanted = set()
+        self.memory = 0
+        self.generated = 0
+        self.evicted = 0
+        self.hits = 0
+        self.misses = 0
+
+    def chunk_range(self, rect, margin=0):
+        """Coords of the chunks overlapping a world rect, plus a margin"""
+        left = max(0, rect.left // CHUNK_SIZE - margin)
+        top = max(0, rect.top // CHUNK_SIZE - margin)
+        right = min(WORLD_CHUNKS[0] - 1, (rect.right - 1) // CHUNK_SIZE + margin)
+        bottom = min(WORLD_CHUNKS[1] - 1, (rect.bottom - 1) // CHUNK_SIZE + margin)
+        return [(cx, cy) for cy in range(top, bottom + 1) for cx in range(left, right + 1)]
+
+    def stream(self, view):
+        """Request chunks around a view rect and finish any that are ready"""
+        self.loader.poll()
+        coords = self.chunk_range(view, LOAD_MARGIN)
+        self.wanted = set(coords)
+        for coord in coords:
+            if coord in self.chunks or coord in self.pending:
+                continue
+            self.pending.add(coord)
+            self.loader.submit(generate_chunk, self.seed, coord, self.scale,
+                               callback=lambda surface, coord=coord: self.store(coord, surface))
+        self.evict()
+
+    def load_now(self, view):
+        """Generate the chunks in view on this thread, e.g. before the first frame"""
+        self.wanted = set(self.chunk_range(view, LOAD_MARGIN))
+        for coord in self.chunk_range(view):
+            if coord not in self.chunks:
+                self.store(coord, generate_chunk(self.seed, coord, self.scale))
+
+    def set_scale(self, scale):
+        """Change the render scale; chunks are drawn again at the new one"""
+        if scale != self.scale:
+            self.scale = scale
+            self.chunks.clear()
+            self.memory = 0
+
+    def store(self, coord, surface):
+        self.pending.discard(coord)
+        if coord not in self.wanted or surface.get_width() != scaled_chunk_size(self.scale):
+            # The view moved on, or the scale changed, while it was being generated
+            return
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        self.chunks[coord] = surface
+        self.memory += chunk_bytes(surface)
+        self.generated += 1
+
+    def evict(self):
+        """Drop the least recently seen chunks until within the budget
+
+        Chunks around the view are kept even over budget, or they would
+        only be generated again on the next frame.
+        """
+        for coord in list(self.chunks):
+            if self.memory <= self.budget:
+                break
+            if coord in self.wanted:
+                continue
+            self.memory -= chunk_bytes(self.chunks.pop(coord))
+            self.evicted += 1
+
+    def draw(self, screen, view):
+        """Blit the chunks overlapping a world rect, with it at the screen's top-left
+
+        The screen is taken to be at the render scale, so it is the
+        view's size times the scale.
+        """
+        size = scaled_chunk_size(self.scale)
+        left = round(view.x * self.scale)
+        top = round(view.y * self.scale)
+        blits = []
+        for coord in self.chunk_range(view):
+            pos = (coord[0] * size - left, coord[1] * size - top)
+            surface = self.chunks.get(coord)
+            if surface is None:
+                self.misses += 1
+                screen.fill(PLACEHOLDER_COLOR, (pos, (size, size)))
+                continue
+            self.hits += 1
+            self.chunks.move_to_end(coord)
+            blits.append((surface, pos))
+        screen.blits(blits, doreturn=False)
+
+    def close(self):
+        """Stop generating chunks and free the ones kept"""
+        self.loader.shutdown()
+        self.chunks.clear()
+        self.pending.clear()
+        self.memory = 0
+
+    def stats(self):
+        """Return chunk cache statistics as a dict"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self.chunks),
+            'memory': self.memory,
+            'budget': self.budget,
+            'generated': self.generated,
+            'evicted': self.evicted,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
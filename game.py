@@ -2,10 +2,35 @@
 """
 Game Entry Point
 Run this file to start the game
+
+Options:
+  --dirty-rects        only redraw screen regions that changed
+  --profile-csv FILE   write frame timings to FILE on exit (F3 shows them in game)
+  --startup-report     print how long startup took once the first frame is shown
+  --record FILE        record input to FILE for replay.py
 """
 
-from data.main import Game
+import os
+import sys
+import argparse
+
+# States import their siblings from the data directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+from main import Game
 
 if __name__ == "__main__":
-    game = Game()
+    parser = argparse.ArgumentParser(description="Run the game")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only redraw screen regions that changed")
+    parser.add_argument("--profile-csv",
+                        help="write per-frame timings to this CSV file on exit")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print startup timings after the first frame")
+    parser.add_argument("--record",
+                        help="record input to this file for replay.py")
+    args = parser.parse_args()
+    
+    game = Game(dirty_rects=args.dirty_rects, profile_csv=args.profile_csv,
+                startup_report=args.startup_report, record=args.record)
     game.run()
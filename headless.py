@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Headless Simulation Entry Point
+Runs the game simulation without a display, as fast as the CPU allows
+
+Usage: python headless.py --ticks 36000
+       python headless.py --population 100000 --years 5 --workers 4
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Use SDL's dummy drivers so no window or sound device is needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+# States import their siblings from the data directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+from main import Game, FIXED_DT
+from catalog import catalog
+from world import CHUNK_SIZE, WORLD_CHUNKS
+from population import Population, DAYS_PER_YEAR, DIED
+
+def skip_time(args):
+    """Run a population time skip on a process pool and report how long it took"""
+    world_size = (WORLD_CHUNKS[0] * CHUNK_SIZE, WORLD_CHUNKS[1] * CHUNK_SIZE)
+    population = Population(args.population, world_size, seed=args.seed, workers=args.workers,
+                            event_kinds=len(catalog.table("events").tagged("npc")))
+    # Start the workers before timing, as the game does before its first skip
+    population.start_workers(wait=True)
+    start = time.perf_counter()
+    events = population.skip(args.years * DAYS_PER_YEAR)
+    elapsed = time.perf_counter() - start
+    population.close()
+    
+    deaths = int((events["event"] == DIED).sum())
+    print(f"Simulated {args.years} year(s) of {args.population} NPCs on {population.workers} worker(s) "
+          f"in {elapsed:.3f}s: {len(events) - deaths} events, {deaths} deaths")
+    print(f"Checksum: {population.checksum():08x}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the simulation headless")
+    parser.add_argument("--ticks", type=int, default=3600,
+                        help="number of fixed simulation steps to run")
+    parser.add_argument("--state", default="game",
+                        help="state to simulate")
+    parser.add_argument("--population", type=int,
+                        help="instead, time skip a population of this many NPCs")
+    parser.add_argument("--years", type=int, default=1,
+                        help="years the population time skip covers")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes for the time skip (default: one per core, less one)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the population")
+    args = parser.parse_args()
+    
+    if args.population:
+        skip_time(args)
+        return
+    
+    game = Game(use_saves=False)
+    start = time.perf_counter()
+    state = game.simulate(args.ticks, args.state)
+    elapsed = time.perf_counter() - start
+    
+    print(f"Simulated {args.ticks} ticks ({args.ticks * FIXED_DT:.1f}s of game time) "
+          f"in {elapsed:.3f}s ({args.ticks / max(elapsed, 1e-9):.0f} ticks/s)")
+    if hasattr(state, "score"):
+        print(f"Final score: {state.score}")
+
+if __name__ == "__main__":
+    main()
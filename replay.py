@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Replay Entry Point
+Plays back input recorded with `game.py --record FILE` and checks the
+game ends up in the same state
+
+Usage: python replay.py session.rec [--speed 4] [--headless]
+"""
+
+import os
+import sys
+import argparse
+
+# States import their siblings from the data directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session")
+    parser.add_argument("recording", help="file written by game.py --record")
+    parser.add_argument("--speed", type=float,
+                        help="play at this multiple of real time (default: as fast as possible)")
+    parser.add_argument("--headless", action="store_true",
+                        help="use SDL's dummy drivers, so no window is opened")
+    parser.add_argument("--no-draw", action="store_true",
+                        help="only run the simulation, without drawing")
+    parser.add_argument("--profile-csv",
+                        help="write per-frame timings to this CSV file")
+    args = parser.parse_args()
+
+    if args.headless:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    from main import Game, FIXED_DT
+    from recording import ReplayPlayer
+    from profiler import COUNTERS
+
+    player = ReplayPlayer(args.recording)
+    # Saves are restored from the recording and never written
+    game = Game(use_saves=False)
+    elapsed = game.replay(player, speed=args.speed, draw=not args.no_draw)
+
+    ticks = player.position
+    print(f"Replayed {ticks}/{len(player.ticks)} ticks ({ticks * FIXED_DT:.1f}s of game time) "
+          f"in {elapsed:.3f}s ({ticks / max(elapsed, 1e-9):.0f} ticks/s)")
+    averages = game.profiler.averages(last=len(game.profiler.frames))
+    if averages:
+        print("Average per frame: " + "  ".join(f"{name} {value:.1f}" if name in COUNTERS else f"{name} {value:.3f}ms"
+                                                for name, value in averages.items()))
+    print(f"Frames over {game.profiler.spike_ms:.1f}ms: {game.profiler.spike_count}")
+    if args.profile_csv:
+        game.profiler.write_csv(args.profile_csv)
+
+    if player.mismatches:
+        for tick, name, expected, state, actual in player.mismatches:
+            print(f"Mismatch at tick {tick}: expected {name} {expected:08x}, got {state} {actual:08x}")
+        sys.exit(1)
+    if ticks == len(player.ticks):
+        print("State checksums match")
+
+if __name__ == "__main__":
+    main()